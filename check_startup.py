@@ -0,0 +1,88 @@
+"""
+启动预算检查
+防止冷启动路径上重新出现重量级导入：
+1. `import main` 不得提前导入托盘/HTTP 服务/YAML 等延迟模块
+2. `import main` 的累计导入耗时不得超过预算
+
+用法: python check_startup.py [--budget-ms 400]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# 只允许在首次使用时导入的模块
+LAZY_MODULES = ["uvicorn", "pystray", "PIL", "requests", "yaml"]
+
+# 子进程输出中模块列表所在行的前缀（main 导入时自身也会打印日志）
+LAZY_PREFIX = "LAZY:"
+
+# 默认导入耗时预算（毫秒），以打包前的开发机为基准
+DEFAULT_BUDGET_MS = 400
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def check_lazy_modules():
+    """返回被 `import main` 提前导入的延迟模块"""
+    code = (
+        "import sys, main; "
+        f"print({LAZY_PREFIX!r} + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 main 失败:\n{result.stderr}")
+    for line in result.stdout.splitlines():
+        if line.startswith(LAZY_PREFIX):
+            return [m for m in line[len(LAZY_PREFIX):].split(",") if m]
+    raise RuntimeError(f"未能在输出中找到模块列表:\n{result.stdout}")
+
+
+def measure_import_ms():
+    """用 -X importtime 测量 `import main` 的累计耗时（毫秒）"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 main 失败:\n{result.stderr}")
+
+    # 格式: import time: self [us] | cumulative | imported package
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+main$", line)
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError("未能在 importtime 输出中找到 main")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动预算检查")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    failed = False
+
+    eager = check_lazy_modules()
+    if eager:
+        print(f"❌ 以下模块应延迟导入: {', '.join(eager)}")
+        failed = True
+    else:
+        print("✅ 延迟导入检查通过")
+
+    elapsed = measure_import_ms()
+    if elapsed > args.budget_ms:
+        print(f"❌ import main 耗时 {elapsed:.1f}ms，超出预算 {args.budget_ms:.0f}ms")
+        failed = True
+    else:
+        print(f"✅ import main 耗时 {elapsed:.1f}ms (预算 {args.budget_ms:.0f}ms)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+蓝绿切换模块
+更新订阅时在备用端口启动新核心，就绪并同步各 select 组的选择后，旧核心让出对外端口、新核心接管，
+系统代理、PAC、proxy.env 与局域网客户端始终指向同一个端口，最后等待旧核心上的连接自然结束并停止旧核心。
+两次 PATCH 之间对外端口会有毫秒级的空档。DNS 监听无法通过 API 迁移，无界面网关模式下局域网
+客户端把 DNS 指向本机，因此改用 reload_in_place 原地重新加载配置，所有端口保持不动
+"""
+
+import time
+
+from core.clash_api import get_controller
+from core.clash_runner import (
+    PUBLIC_MIXED_PORT,
+    get_active_slot,
+    get_controller_url,
+    get_slot_supervisor,
+    get_standby_slot,
+    prepare_slot_config,
+    set_active_slot,
+    start_clash,
+    stop_clash,
+    wait_clash_ready,
+)
+
+
+def _sync_selections(controller, selections):
+    """在新核心上选中同样的节点（新配置中不存在的组或节点保持默认），返回同步成功的组数"""
+    try:
+        groups = controller.get_proxies()
+    except Exception as e:
+        print(f"[BlueGreen] ⚠️ 同步节点选择失败: {e}")
+        return 0
+    synced = 0
+    for group, name in selections.items():
+        if name not in (groups.get(group, {}).get("all") or []):
+            print(f"[BlueGreen] ⚠️ 新配置中 {group} 没有节点 {name}，使用默认选择")
+            continue
+        try:
+            if controller.select_proxy(group, name):
+                synced += 1
+        except Exception as e:
+            print(f"[BlueGreen] ⚠️ 同步 {group} 失败: {e}")
+    return synced
+
+
+def _current_selections(controller):
+    try:
+        return controller.get_selections()
+    except Exception as e:
+        print(f"[BlueGreen] ⚠️ 读取节点选择失败: {e}")
+        return {}
+
+
+def _drain(controller, timeout):
+    """等待旧核心上的连接结束，超时后直接停止"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if not controller.get_connections(timeout=1):
+                return True
+        except Exception:
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def blue_green_swap(ready_timeout=15, drain_timeout=10):
+    """
+    用新配置启动备用核心并无缝切换
+
+    Args:
+        ready_timeout: 等待新核心就绪的最长时间
+        drain_timeout: 等待旧核心连接结束的最长时间
+
+    Returns:
+        dict: 切换结果（槽位、端口、各阶段耗时）
+    """
+    started = time.perf_counter()
+    old_slot = get_active_slot()
+    new_slot = get_standby_slot()
+    old_controller = get_controller(get_controller_url(old_slot))
+    new_controller = get_controller(get_controller_url(new_slot))
+
+    # 1️⃣ 记住旧核心所有 select 组当前选择的节点
+    selections = _current_selections(old_controller)
+
+    # 2️⃣ 在备用端口启动新核心并等待就绪
+    print(f"[BlueGreen] 正在启动备用核心 ({new_slot})...")
+    if not start_clash(new_slot, standby=True):
+        raise RuntimeError("备用 Clash 核心启动失败，请检查配置文件")
+    if not wait_clash_ready(ready_timeout, slot=new_slot):
+        stop_clash(new_slot)
+        raise RuntimeError("备用 Clash 核心未在规定时间内就绪，已保留旧核心")
+    ready_ms = round((time.perf_counter() - started) * 1000)
+
+    # 3️⃣ 新核心选中同样的节点
+    synced = _sync_selections(new_controller, selections)
+
+    # 4️⃣ 旧核心让出对外端口，新核心接管；接管失败时旧核心收回端口继续服务
+    try:
+        old_controller.patch_config({"mixed-port": 0})
+    except Exception as e:
+        print(f"[BlueGreen] ⚠️ 旧核心释放端口失败: {e}")
+    try:
+        claimed = new_controller.patch_config({"mixed-port": PUBLIC_MIXED_PORT})
+    except Exception as e:
+        print(f"[BlueGreen] ⚠️ 新核心接管端口失败: {e}")
+        claimed = False
+    if not claimed:
+        try:
+            old_controller.patch_config({"mixed-port": PUBLIC_MIXED_PORT})
+        except Exception as e:
+            print(f"[BlueGreen] ⚠️ 旧核心收回端口失败: {e}")
+        stop_clash(new_slot)
+        raise RuntimeError(f"新核心无法接管端口 {PUBLIC_MIXED_PORT}，已保留旧核心")
+
+    # 5️⃣ API 与托盘指向新核心（系统代理端口不变，无需改动）
+    set_active_slot(new_slot)
+
+    # 6️⃣ 旧核心排空后停止
+    drained = _drain(old_controller, drain_timeout)
+    stop_clash(old_slot)
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    print(f"[BlueGreen] ✅ 已切换到 {new_slot}，耗时 {elapsed_ms}ms")
+
+    return {
+        "slot": new_slot,
+        "mixed_port": PUBLIC_MIXED_PORT,
+        "selected": selections,
+        "synced_groups": synced,
+        "time_to_ready_ms": ready_ms,
+        "drained": drained,
+        "elapsed_ms": elapsed_ms,
+    }
+
+
+def reload_in_place():
+    """
+    活动核心原地重新加载新配置（无界面网关模式使用）
+    代理、DNS 与附加入口的端口都不变，局域网客户端无需任何改动；重新加载后同步节点选择，
+    并像核心重新就绪一样执行 on_ready 回调（DNS 预热、测速与负载均衡重置等）
+
+    Returns:
+        dict: 重新加载结果
+    """
+    started = time.perf_counter()
+    slot = get_active_slot()
+    controller = get_controller()
+    selections = _current_selections(controller)
+
+    if not controller.reload_config(prepare_slot_config(slot)):
+        raise RuntimeError("Clash 重新加载配置失败，已保留旧配置")
+    synced = _sync_selections(controller, selections)
+    for callback in get_slot_supervisor(slot).on_ready:
+        try:
+            callback(controller)
+        except Exception as e:
+            print(f"[BlueGreen] ⚠️ 就绪回调失败: {e}")
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    print(f"[BlueGreen] ✅ 已原地重新加载配置，耗时 {elapsed_ms}ms")
+
+    return {
+        "slot": slot,
+        "mixed_port": PUBLIC_MIXED_PORT,
+        "selected": selections,
+        "synced_groups": synced,
+        "elapsed_ms": elapsed_ms,
+    }
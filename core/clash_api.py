@@ -0,0 +1,252 @@
+"""
+Clash 控制器 API 客户端
+所有对 external-controller 的访问都走同一个 Session，复用 keep-alive 连接
+"""
+
+import threading
+import time
+from urllib.parse import quote
+
+CLASH_API_BASE = "http://127.0.0.1:9090"
+SELECTOR_GROUP = "节点选择"
+
+
+class ClashController:
+    """Clash external-controller 客户端"""
+
+    def __init__(self, base_url=CLASH_API_BASE, secret=""):
+        self.base_url = base_url.rstrip("/")
+        self.secret = secret
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """延迟创建共享 Session（首次访问时才导入 requests）"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+
+                    session = requests.Session()
+                    # 控制器在本机，绝不能走系统代理
+                    session.trust_env = False
+                    if self.secret:
+                        session.headers["Authorization"] = f"Bearer {self.secret}"
+                    self._session = session
+        return self._session
+
+    def _url(self, path):
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, timeout=3, **kwargs):
+        return self.session.request(method, self._url(path), timeout=timeout, **kwargs)
+
+    # ---------- 代理 ----------
+    def get_proxies(self, timeout=3):
+        """完整的 /proxies 数据"""
+        response = self.request("GET", "/proxies", timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("proxies", {})
+
+    def get_proxy(self, name, timeout=3):
+        """单个代理或代理组的信息"""
+        response = self.request("GET", f"/proxies/{quote(name, safe='')}", timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def select_proxy(self, group, name, timeout=3):
+        """切换 select 组当前节点，成功返回 True"""
+        response = self.request(
+            "PUT",
+            f"/proxies/{quote(group, safe='')}",
+            json={"name": name},
+            timeout=timeout,
+        )
+        return response.status_code == 204
+
+    def update_provider(self, name, timeout=10):
+        """让 Clash 重新加载 proxy-provider，成功返回 True"""
+        response = self.request("PUT", f"/providers/proxies/{quote(name, safe='')}", timeout=timeout)
+        return response.status_code == 204
+
+    # ---------- 配置 ----------
+    def patch_config(self, values, timeout=3):
+        """热修改运行中的配置（mixed-port 等入口端口、mode、log-level），成功返回 True"""
+        response = self.request("PATCH", "/configs", json=values, timeout=timeout)
+        return response.status_code == 204
+
+    def reload_config(self, path, timeout=10):
+        """让核心原地重新加载配置文件，端口不变的入口与 DNS 监听保持不动，成功返回 True"""
+        response = self.request("PUT", "/configs", params={"force": "true"}, json={"path": path}, timeout=timeout)
+        return response.status_code == 204
+
+    def get_selections(self, timeout=3):
+        """所有 select 组当前选中的节点 {组名: 节点名}"""
+        return {
+            name: proxy["now"]
+            for name, proxy in self.get_proxies(timeout=timeout).items()
+            if proxy.get("type") == "Selector" and proxy.get("now")
+        }
+
+    # ---------- DNS ----------
+    def dns_query(self, name, qtype="A", timeout=5):
+        """通过核心的 DNS 模块解析域名（结果进入核心的 DNS 缓存）"""
+        response = self.request("GET", "/dns/query", params={"name": name, "type": qtype}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def test_delay(self, name, url, timeout_ms=3000):
+        """
+        让 Clash 对单个节点测速
+
+        Returns:
+            int | None: 延迟毫秒数，超时或失败为 None
+        """
+        try:
+            response = self.request(
+                "GET",
+                f"/proxies/{quote(name, safe='')}/delay",
+                params={"url": url, "timeout": timeout_ms},
+                timeout=timeout_ms / 1000 + 1,
+            )
+            if response.status_code == 200:
+                return response.json().get("delay") or None
+        except Exception:
+            pass
+        return None
+
+    def is_ready(self, timeout=1):
+        """控制器是否已可用"""
+        try:
+            return self.request("GET", "/version", timeout=timeout).status_code == 200
+        except Exception:
+            return False
+
+    # ---------- 连接 ----------
+    def get_connections(self, timeout=3):
+        response = self.request("GET", "/connections", timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("connections") or []
+
+    def close_connection(self, conn_id, timeout=3):
+        response = self.request("DELETE", f"/connections/{quote(conn_id, safe='')}", timeout=timeout)
+        return response.status_code in (200, 204)
+
+    def close_connections_via(self, node, hosts=None, rules=None, group=None):
+        """
+        关闭经过指定节点的连接
+
+        Args:
+            node: 连接链路 (chains) 中包含的节点名
+            hosts: 只关闭目标主机匹配这些域名后缀/IP 的连接
+            rules: 只关闭命中这些规则类型或规则内容的连接
+            group: 只关闭链路中同时经过该组的连接（其他组恰好也用这个节点的连接不受影响）
+
+        Returns:
+            int: 实际关闭的连接数
+        """
+        closed = 0
+        for conn in self.get_connections():
+            chains = conn.get("chains") or []
+            if node not in chains or (group and group not in chains):
+                continue
+            if hosts and not _match_host(conn.get("metadata") or {}, hosts):
+                continue
+            if rules and conn.get("rule") not in rules and conn.get("rulePayload") not in rules:
+                continue
+            try:
+                if self.close_connection(conn["id"]):
+                    closed += 1
+            except Exception as e:
+                print(f"[ClashAPI] ⚠️ 关闭连接失败 {conn.get('id')}: {e}")
+        return closed
+
+
+def resolve_leaf(proxies, name):
+    """沿代理组的 now 逐层解析到实际出口节点；解析不到（组没有当前选择或成环）时返回 None"""
+    seen = set()
+    while name and name not in seen:
+        seen.add(name)
+        now = proxies.get(name, {}).get("now")
+        if not now:
+            return None if proxies.get(name, {}).get("all") else name
+        name = now
+    return None
+
+
+def _match_host(metadata, hosts):
+    """目标主机是否匹配任一域名后缀或 IP"""
+    host = (metadata.get("host") or "").lower()
+    ip = metadata.get("destinationIP") or ""
+    for pattern in hosts:
+        pattern = pattern.lower()
+        # 只去掉一段完整的通配前缀（lstrip 按字符集剥离，会把 "*.*.x"、".x" 之类多余的 * 和 . 一并削掉）
+        for prefix in ("*.", "+."):
+            if pattern.startswith(prefix):
+                pattern = pattern[len(prefix):]
+        if ip == pattern or host == pattern or host.endswith("." + pattern):
+            return True
+    return False
+
+
+# =====================================================
+# 全局实例
+# =====================================================
+# 每个控制器地址一个客户端；蓝绿切换时会同时存在两个核心
+_controllers = {}
+_active_base_url = CLASH_API_BASE
+
+
+def get_controller(base_url=None):
+    """获取控制器客户端（默认为当前活动的核心）"""
+    base_url = base_url or _active_base_url
+    controller = _controllers.get(base_url)
+    if controller is None:
+        controller = _controllers.setdefault(base_url, ClashController(base_url))
+    return controller
+
+
+def set_active_controller(base_url):
+    """切换默认控制器（蓝绿切换完成后调用）"""
+    global _active_base_url
+    _active_base_url = base_url
+
+
+def switch_node(name, group=SELECTOR_GROUP, drain=False, drain_hosts=None, drain_rules=None):
+    """
+    切换节点，可选地断开旧节点上的存量连接
+
+    组当前选择的往往是另一个组（如「自动选择」），排空前先解析到实际出口节点，
+    且只断开经过本组的连接；新旧选择解析到同一个出口时不断开
+
+    Returns:
+        dict: previous / previous_node / closed_connections / elapsed_ms
+    """
+    started = time.perf_counter()
+    controller = get_controller()
+
+    previous = previous_node = next_node = None
+    if drain:
+        try:
+            proxies = controller.get_proxies()
+            previous = proxies.get(group, {}).get("now")
+            previous_node = resolve_leaf(proxies, previous)
+            next_node = resolve_leaf(proxies, name)
+        except Exception as e:
+            print(f"[ClashAPI] ⚠️ 获取当前节点失败: {e}")
+
+    if not controller.select_proxy(group, name):
+        raise RuntimeError(f"切换节点失败: {group} -> {name}")
+
+    closed = 0
+    if drain and previous_node and previous_node != next_node:
+        closed = controller.close_connections_via(previous_node, drain_hosts, drain_rules, group=group)
+        print(f"[ClashAPI] 已断开 {group} 经旧节点 {previous_node} 的 {closed} 个连接")
+
+    return {
+        "previous": previous,
+        "previous_node": previous_node,
+        "closed_connections": closed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -4,12 +4,38 @@ import subprocess
 import threading
 import time
 
+from core.clash_api import get_controller, set_active_controller
+from core.clash_supervisor import get_supervisor
+from core.geodata import get_geodata_manager
+
 # =====================================================
 # 全局状态
 # =====================================================
-_clash_process = None
 _clash_lock = threading.Lock()
 
+# 对外的代理端口：系统代理、PAC、proxy.env 与局域网客户端始终指向它，由活动核心持有
+PUBLIC_MIXED_PORT = 7890
+
+# 蓝绿两套端口：更新订阅时新核心在备用槽位的端口启动，就绪后再接管对外端口
+SLOTS = {
+    "blue": {
+        "config": "config-blue.yaml",
+        "mixed_port": 7892,
+        "controller_port": 9090,
+        "dns_listen": "0.0.0.0:1052",
+        # 附加入口（测速等）的端口偏移，两个核心同时运行时互不冲突
+        "listener_offset": 0,
+    },
+    "green": {
+        "config": "config-green.yaml",
+        "mixed_port": 7891,
+        "controller_port": 9091,
+        "dns_listen": "0.0.0.0:1053",
+        "listener_offset": 100,
+    },
+}
+_active_slot = "blue"
+
 
 # =====================================================
 # PyInstaller 资源路径
@@ -28,21 +54,25 @@ def resource_path(relative_path: str) -> str:
 # =====================================================
 # Clash 路径
 # =====================================================
+CLASH_EXE_NAME = "clash-core.exe" if os.name == "nt" else "clash-core"
+# Windows 下不为核心弹出控制台窗口
+POPEN_KWARGS = {"creationflags": subprocess.CREATE_NO_WINDOW} if os.name == "nt" else {}
+
 def get_clash_exe_path():
     """
-    返回运行时 clash-core.exe 路径
+    返回运行时 Clash 核心路径（Windows 为 clash-core.exe，其他平台为 clash-core）
     
     🔥 修复：支持 PyInstaller 打包后的路径
     """
     # 1️⃣ 优先查找打包后的资源路径
-    exe_path = resource_path(os.path.join("clash", "clash-core.exe"))
+    exe_path = resource_path(os.path.join("clash", CLASH_EXE_NAME))
     
     if os.path.exists(exe_path):
         print(f"[Clash] 找到 Clash 核心: {exe_path}")
         return exe_path
     
     # 2️⃣ 检查当前工作目录
-    exe_path_cwd = os.path.join(os.getcwd(), "clash", "clash-core.exe")
+    exe_path_cwd = os.path.join(os.getcwd(), "clash", CLASH_EXE_NAME)
     if os.path.exists(exe_path_cwd):
         print(f"[Clash] 找到 Clash 核心: {exe_path_cwd}")
         return exe_path_cwd
@@ -51,13 +81,13 @@ def get_clash_exe_path():
     if getattr(sys, 'frozen', False):
         # 打包后的 exe 所在目录
         exe_dir = os.path.dirname(sys.executable)
-        exe_path_exe = os.path.join(exe_dir, "clash", "clash-core.exe")
+        exe_path_exe = os.path.join(exe_dir, "clash", CLASH_EXE_NAME)
         if os.path.exists(exe_path_exe):
             print(f"[Clash] 找到 Clash 核心: {exe_path_exe}")
             return exe_path_exe
     
     # 4️⃣ 打印调试信息
-    print(f"[Clash] ❌ 未找到 clash-core.exe")
+    print(f"[Clash] ❌ 未找到 {CLASH_EXE_NAME}")
     print(f"[Clash] 查找路径:")
     print(f"  1. {exe_path}")
     print(f"  2. {exe_path_cwd}")
@@ -67,66 +97,156 @@ def get_clash_exe_path():
     print(f"[Clash] sys._MEIPASS: {getattr(sys, '_MEIPASS', 'N/A')}")
     
     raise FileNotFoundError(
-        "未找到 clash/clash-core.exe\n"
+        f"未找到 clash/{CLASH_EXE_NAME}\n"
         "请确保 clash 文件夹与程序在同一目录下"
     )
 
 
-def get_config_path():
-    """
-    返回 Clash 配置路径
-    
-    🔥 修复：配置文件应该在工作目录，而不是打包目录
-    """
+def get_core_dir():
+    """Clash 工作目录（-d）：配置、provider 与 GeoIP 数据库都放在这里"""
     # 配置文件始终在当前工作目录的 config 文件夹
     config_dir = os.path.join(os.getcwd(), "config")
     os.makedirs(config_dir, exist_ok=True)
+    return config_dir
+
+
+def get_config_path(slot=None):
+    """
+    返回 Clash 配置路径（slot 为空时是主配置 config.yaml，否则是该槽位运行时使用的配置）
     
-    config_path = os.path.join(config_dir, "config.yaml")
+    🔥 修复：配置文件应该在工作目录，而不是打包目录
+    """
+    config_path = os.path.join(get_core_dir(), SLOTS[slot]["config"] if slot else "config.yaml")
     print(f"[Clash] 配置文件路径: {config_path}")
     
     return config_path
 
 
+def prepare_slot_config(slot, standby=False):
+    """
+    以主配置 config.yaml 为基础，生成指定槽位的配置（替换端口）
+
+    Args:
+        standby: 作为蓝绿切换的备用核心启动，代理与 DNS 使用槽位自己的端口，
+                 避免与仍在服务的活动核心冲突；否则直接使用主配置中的对外端口
+    """
+    if slot == "blue" and not standby:
+        return get_config_path()
+
+    import yaml
+
+    with open(get_config_path(), "r", encoding="utf-8") as f:
+        config_data = yaml.safe_load(f)
+
+    ports = SLOTS[slot]
+    config_data["external-controller"] = f"127.0.0.1:{ports['controller_port']}"
+    if standby:
+        config_data["mixed-port"] = ports["mixed_port"]
+        if isinstance(config_data.get("dns"), dict):
+            config_data["dns"]["listen"] = ports["dns_listen"]
+    for listener in config_data.get("listeners") or []:
+        listener["port"] += ports["listener_offset"]
+
+    config_path = get_config_path(slot)
+    with open(config_path, "w", encoding="utf-8") as f:
+        yaml.dump(config_data, f, allow_unicode=True, sort_keys=False)
+
+    return config_path
+
+
+# =====================================================
+# 槽位
+# =====================================================
+def get_controller_url(slot):
+    return f"http://127.0.0.1:{SLOTS[slot]['controller_port']}"
+
+
+def get_active_slot():
+    return _active_slot
+
+
+def get_standby_slot():
+    return "green" if _active_slot == "blue" else "blue"
+
+
+def set_active_slot(slot):
+    """切换活动槽位：API、托盘、系统代理都跟随它"""
+    global _active_slot
+    _active_slot = slot
+    set_active_controller(get_controller_url(slot))
+    print(f"[Clash] 活动核心已切换到 {slot} (mixed-port {get_mixed_port()})")
+
+
+def get_mixed_port():
+    """系统代理应指向的端口：活动核心就绪后总会持有对外端口"""
+    return PUBLIC_MIXED_PORT
+
+
+def claim_public_port(controller):
+    """
+    on_ready 回调：活动核心接管对外端口
+    备用槽位的核心以自己的端口启动，崩溃重启后也是如此，就绪后在这里改回对外端口；
+    蓝绿切换中的新核心就绪时还不是活动核心，由切换流程负责交接
+    """
+    if controller is not get_controller():
+        return
+    try:
+        if not controller.patch_config({"mixed-port": PUBLIC_MIXED_PORT}):
+            print(f"[Clash] ⚠️ 接管端口 {PUBLIC_MIXED_PORT} 失败")
+    except Exception as e:
+        print(f"[Clash] ⚠️ 接管端口 {PUBLIC_MIXED_PORT} 失败: {e}")
+
+
+def get_listener_port(port, slot=None):
+    """附加入口在指定槽位（默认活动槽位）核心上的实际端口"""
+    return port + SLOTS[slot or _active_slot]["listener_offset"]
+
+
+def get_slot_supervisor(slot=None):
+    slot = slot or _active_slot
+    return get_supervisor(slot, get_controller(get_controller_url(slot)))
+
+
 # =====================================================
 # Clash 控制
 # =====================================================
-def start_clash():
+def start_clash(slot=None, standby=False):
     """
-    启动 Clash（无黑窗）
+    启动 Clash（无黑窗，由守护者监视并在崩溃后自动重启）
+
+    Args:
+        standby: 作为蓝绿切换的备用核心启动（见 prepare_slot_config）
     """
-    global _clash_process
+    slot = slot or _active_slot
+    supervisor = get_slot_supervisor(slot)
 
     with _clash_lock:
-        if _clash_process and _clash_process.poll() is None:
+        if supervisor.is_running():
             print("[Clash] Clash 已在运行")
             return True
 
         try:
             exe = get_clash_exe_path()
-            config = get_config_path()
+            config = prepare_slot_config(slot, standby)
 
             if not os.path.exists(config):
                 print(f"[Clash] ⚠️ 配置文件不存在: {config}")
                 raise RuntimeError(f"配置文件不存在: {config}")
 
-            print(f"[Clash] 启动命令: {exe} -f {config}")
-            
-            _clash_process = subprocess.Popen(
-                [exe, "-f", config],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            # 以配置目录作为工作目录：provider 等相对路径都落在这里
+            home = os.path.dirname(config)
+            # 放入本地缓存的 GeoIP/GeoSite 数据库，核心无需在启动时下载
+            get_geodata_manager().place(home)
+            print(f"[Clash] 启动命令: {exe} -d {home} -f {config}")
             
-            print(f"[Clash] ✅ Clash 进程已启动 (PID: {_clash_process.pid})")
-            time.sleep(0.8)
+            started = supervisor.start([exe, "-d", home, "-f", config], **POPEN_KWARGS)
             
             # 验证进程是否还在运行
-            if _clash_process.poll() is not None:
+            if not started:
                 print(f"[Clash] ❌ Clash 进程启动后立即退出")
                 return False
             
+            print(f"[Clash] ✅ Clash 进程已启动 (PID: {supervisor.status()['pid']})")
             return True
             
         except FileNotFoundError as e:
@@ -137,27 +257,30 @@ def start_clash():
             return False
 
 
-def stop_clash():
-    """
-    停止 Clash
+def stop_clash(slot=None):
     """
-    global _clash_process
+    停止 Clash（同时停止守护，不会再自动重启）
 
+    Args:
+        slot: 只停止指定槽位；为空时停止所有槽位
+    """
     with _clash_lock:
-        if _clash_process:
+        for name in ([slot] if slot else list(SLOTS)):
+            supervisor = get_slot_supervisor(name)
+            was_running = supervisor.is_running()
             try:
-                print(f"[Clash] 正在停止 Clash 进程 (PID: {_clash_process.pid})")
-                _clash_process.terminate()
-                _clash_process.wait(timeout=3)
-                print("[Clash] ✅ Clash 已停止")
-            except subprocess.TimeoutExpired:
-                print("[Clash] ⚠️ 进程未响应，强制终止")
-                _clash_process.kill()
-                _clash_process.wait()
+                supervisor.stop(timeout=3)
+                if was_running:
+                    print(f"[Clash] ✅ Clash 已停止 ({name})")
             except Exception as e:
                 print(f"[Clash] ⚠️ 停止进程时出错: {e}")
-            finally:
-                _clash_process = None
+
+
+def wait_clash_ready(timeout=None, slot=None):
+    """
+    等待 Clash 控制器就绪
+    """
+    return get_slot_supervisor(slot).wait_ready(timeout)
 
 
 # =====================================================
@@ -167,14 +290,14 @@ def get_clash_status():
     """
     获取 Clash 当前状态
     """
-    running = False
-
-    with _clash_lock:
-        if _clash_process and _clash_process.poll() is None:
-            running = True
+    supervisor = get_slot_supervisor()
 
     return {
-        "running": running,
+        "slot": _active_slot,
+        "mixed_port": get_mixed_port(),
+        "running": supervisor.is_running(),
+        "ready": supervisor.ready.is_set(),
+        "restarts": supervisor.restarts,
         "node": "当前节点",
         "delay": "-"
     }
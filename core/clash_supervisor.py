@@ -0,0 +1,262 @@
+"""
+Clash 进程守护模块
+- 在独立的 asyncio 事件循环中启动并监视核心进程，不阻塞 API/托盘线程
+- 进程异常退出后按指数退避自动重启（有上限）
+- 核心输出保存在内存环形缓冲区中，崩溃/重启/就绪耗时记录为事件
+"""
+
+import asyncio
+import collections
+import sys
+import threading
+import time
+
+from core.clash_api import get_controller
+from core.settings import get_settings
+
+
+class LogRingBuffer:
+    """按字节数限制的输出环形缓冲区"""
+
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self._chunks = collections.deque()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def append(self, data):
+        with self._lock:
+            self._chunks.append(data)
+            self._size += len(data)
+            while self._size > self.limit and len(self._chunks) > 1:
+                self._size -= len(self._chunks.popleft())
+
+    def tail(self, max_bytes=None):
+        with self._lock:
+            data = b"".join(self._chunks)
+        limit = min(max_bytes or self.limit, self.limit)
+        return data[-limit:].decode("utf-8", errors="replace")
+
+
+class ClashSupervisor:
+    """单个 Clash 核心进程的守护者"""
+
+    def __init__(self, name="main", controller=None):
+        cfg = get_settings("supervisor")
+        self.name = name
+        self.controller = controller or get_controller()
+        self.backoff = cfg["restart_backoff"]
+        self.backoff_max = cfg["restart_backoff_max"]
+        self.stable_uptime = cfg["stable_uptime"]
+        self.ready_timeout = cfg["ready_timeout"]
+
+        self.log = LogRingBuffer(int(cfg["log_buffer_kb"]) * 1024)
+        self.events = collections.deque(maxlen=200)
+        self.restarts = 0
+        self.ready = threading.Event()
+        # 每次控制器就绪（首次启动、崩溃重启）后调用 callback(controller)，在线程池中执行
+        self.on_ready = []
+
+        self._loop = None
+        self._loop_ready = threading.Event()
+        self._process = None
+        self._task = None
+        self._stop_event = None
+        self._cmd = None
+        self._popen_kwargs = {}
+
+    # ---------- 事件循环 ----------
+    @staticmethod
+    def _new_loop():
+        """
+        守护线程中的事件循环要能创建子进程：Windows 上只有 ProactorEventLoop 支持
+        （不依赖默认策略，避免被设置成 Selector 循环）；Unix 上 Python 3.8 起默认的
+        ThreadedChildWatcher 不要求循环运行在主线程
+        """
+        if sys.platform == "win32":
+            return asyncio.ProactorEventLoop()
+        return asyncio.new_event_loop()
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return self._loop
+
+        def run():
+            loop = self._new_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            self._loop_ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name=f"clash-supervisor-{self.name}", daemon=True).start()
+        self._loop_ready.wait()
+        return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _event(self, event, **info):
+        record = {"time": time.time(), "event": event, **info}
+        self.events.append(record)
+        detail = ", ".join(f"{k}={v}" for k, v in info.items())
+        print(f"[Supervisor:{self.name}] {event} {detail}".rstrip())
+
+    # ---------- 对外接口 ----------
+    def is_running(self):
+        return self._process is not None and self._process.returncode is None
+
+    def start(self, cmd, grace=0.8, **popen_kwargs):
+        """
+        启动并守护核心进程
+
+        Returns:
+            bool: 进程在 grace 秒后仍在运行
+        """
+        if self._task is not None and not self._task.done():
+            # 已在守护中（可能处于重启退避期）
+            return True
+
+        self._cmd = list(cmd)
+        self._popen_kwargs = popen_kwargs
+        return self._submit(self._start(grace)).result()
+
+    def stop(self, timeout=3):
+        """停止守护并结束进程"""
+        if self._loop is None:
+            return
+        self._submit(self._stop(timeout)).result()
+
+    def wait_ready(self, timeout=None):
+        """阻塞等待控制器就绪"""
+        return self.ready.wait(self.ready_timeout if timeout is None else timeout)
+
+    def status(self):
+        last_ready = next((e for e in reversed(self.events) if e["event"] == "ready"), None)
+        return {
+            "name": self.name,
+            "running": self.is_running(),
+            "ready": self.ready.is_set(),
+            "pid": self._process.pid if self.is_running() else None,
+            "restarts": self.restarts,
+            "time_to_ready_ms": last_ready["time_to_ready_ms"] if last_ready else None,
+            "events": list(self.events),
+        }
+
+    # ---------- 协程 ----------
+    async def _start(self, grace):
+        self._stop_event = asyncio.Event()
+        spawned = asyncio.get_running_loop().create_future()
+        self._task = asyncio.ensure_future(self._supervise(spawned))
+        if not await spawned:
+            return False
+        await asyncio.sleep(grace)
+        if not self.is_running():
+            # 启动即退出（通常是配置错误），不进入重启循环
+            await self._stop(0)
+            return False
+        return True
+
+    async def _stop(self, timeout):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+        process = self._process
+        if process is not None and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), timeout)
+            except asyncio.TimeoutError:
+                print(f"[Supervisor:{self.name}] ⚠️ 进程未响应，强制终止")
+                process.kill()
+                await process.wait()
+
+        if self._task is not None:
+            await self._task
+            self._task = None
+        self.ready.clear()
+
+    async def _supervise(self, spawned):
+        failures = 0
+
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.ready.clear()
+
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    *self._cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    **self._popen_kwargs,
+                )
+            except Exception as e:
+                self._event("spawn_failed", error=str(e))
+                if not spawned.done():
+                    spawned.set_result(False)
+                return
+
+            self._event("started", pid=self._process.pid)
+            if not spawned.done():
+                spawned.set_result(True)
+
+            pump = asyncio.ensure_future(self._pump_output(self._process.stdout))
+            probe = asyncio.ensure_future(self._wait_ready(started))
+            code = await self._process.wait()
+            probe.cancel()
+            await pump
+
+            if self._stop_event.is_set():
+                self._event("stopped", code=code)
+                break
+
+            uptime = time.monotonic() - started
+            failures = 0 if uptime >= self.stable_uptime else failures + 1
+            delay = min(self.backoff * 2 ** max(failures - 1, 0), self.backoff_max)
+            self._event("crashed", code=code, uptime_s=round(uptime, 1))
+            self._event("restarting", delay_s=delay)
+            self.restarts += 1
+
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _pump_output(self, stream):
+        while True:
+            data = await stream.read(4096)
+            if not data:
+                break
+            self.log.append(data)
+
+    def _run_callback(self, callback):
+        try:
+            callback(self.controller)
+        except Exception as e:
+            print(f"[Supervisor:{self.name}] ⚠️ 就绪回调失败: {e}")
+
+    async def _wait_ready(self, started):
+        loop = asyncio.get_running_loop()
+        deadline = started + self.ready_timeout
+        while time.monotonic() < deadline:
+            if await loop.run_in_executor(None, self.controller.is_ready, 0.5):
+                self.ready.set()
+                self._event("ready", time_to_ready_ms=round((time.monotonic() - started) * 1000))
+                for callback in self.on_ready:
+                    loop.run_in_executor(None, self._run_callback, callback)
+                return
+            await asyncio.sleep(0.2)
+        self._event("ready_timeout", timeout_s=self.ready_timeout)
+
+
+# =====================================================
+# 全局实例
+# =====================================================
+_supervisors = {}
+
+
+def get_supervisor(name="main", controller=None):
+    """获取指定名称的 Clash 守护者（不存在则创建）"""
+    supervisor = _supervisors.get(name)
+    if supervisor is None:
+        supervisor = _supervisors.setdefault(name, ClashSupervisor(name, controller))
+    return supervisor
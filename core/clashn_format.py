@@ -1,5 +1,134 @@
+"""
+clashn 每日免费节点源
+每日文件常常延迟发布，当天的文件可能尚不存在：并发探测今天及前几天的地址，取最新一个可用的。
+订阅地址写作 clashn://daily（可加 ?days=N 指定向前探测的天数，0~30），与普通订阅一样交给 merge_subscriptions；
+下载与普通订阅一样流式经过 SubscriptionDecoder（清理 YAML 类型标签、受 max_size_mb 限制）；
+已下载的每日文件按日期缓存，同一天的文件只下载一次
+"""
+
+import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlparse
+
+from core.settings import get_settings
+from core.subscription_fetch import CACHE_DIR, SubscriptionDecoder, iter_limited
+
+CLASHN_SCHEME = "clashn://"
+# 默认向前探测的天数（不含今天）
+DEFAULT_DAYS = 3
+# days 参数的上限，以及同时下载的文件数上限
+MAX_DAYS = 30
+MAX_WORKERS = 4
+
+
 def build_clashn_url(dt):
     return (
         f"https://node.clashn.net/uploads/"
         f"{dt.year}/{dt.month:02d}/{dt.day}-{dt.strftime('%Y%m%d')}.yaml"
     )
+
+
+def is_clashn_source(url):
+    return url.startswith(CLASHN_SCHEME)
+
+
+def _cache_path(day):
+    return os.path.join(CACHE_DIR, f"clashn-{day.strftime('%Y%m%d')}.yaml")
+
+
+def _read_cached(day):
+    # 较早版本缓存的是未经清理的原文，读取时同样经过解码器
+    decoder = SubscriptionDecoder()
+    try:
+        with open(_cache_path(day), "rb") as f:
+            decoder.feed(f.read())
+    except OSError:
+        return None
+    return decoder.finish()
+
+
+def _write_cached(day, text):
+    path = _cache_path(day)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[Clashn] ⚠️ 写入缓存失败: {e}")
+
+
+def _download(day, timeout):
+    import requests
+
+    cfg = get_settings("fetch")
+    decoder = SubscriptionDecoder()
+    with requests.get(build_clashn_url(day), timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            return None
+        for chunk in iter_limited(response, cfg["chunk_kb"] * 1024, cfg["max_size_mb"]):
+            decoder.feed(chunk)
+    text = decoder.finish()
+    return text if "proxies" in text else None
+
+
+def fetch_clashn(url=CLASHN_SCHEME + "daily", today=None, timeout=10):
+    """
+    获取最新可用的每日节点文件
+
+    Returns:
+        (str, bool): 文件内容，以及是否为新下载（False 表示来自缓存）
+    """
+    query = parse_qs(urlparse(url).query)
+    try:
+        days = int(query.get("days", [DEFAULT_DAYS])[0])
+    except ValueError:
+        days = DEFAULT_DAYS
+    days = min(max(days, 0), MAX_DAYS)
+    today = today or datetime.date.today()
+    candidates = [today - datetime.timedelta(days=i) for i in range(days + 1)]
+
+    # 比所有未缓存日期都新的缓存可以直接使用
+    pending = []
+    for day in candidates:
+        cached = _read_cached(day)
+        if cached is not None:
+            if not pending:
+                print(f"[Clashn] 使用缓存: {day}")
+                return cached, False
+            break
+        pending.append(day)
+
+    results = {}
+    pool = ThreadPoolExecutor(max_workers=min(len(pending), MAX_WORKERS))
+    try:
+        futures = {pool.submit(_download, day, timeout): day for day in pending}
+        for future in as_completed(futures):
+            day = futures[future]
+            try:
+                results[day] = future.result()
+            except Exception:
+                results[day] = None
+            if results[day]:
+                _write_cached(day, results[day])
+
+            # 按从新到旧：更新的日期都已确定不可用时即可返回
+            for candidate in pending:
+                if candidate not in results:
+                    break
+                if results[candidate]:
+                    print(f"[Clashn] ✅ 使用 {candidate} 的节点文件")
+                    return results[candidate], True
+    finally:
+        pool.shutdown(wait=False)
+
+    # 探测范围内只有更早的缓存可用
+    for day in candidates[len(pending):]:
+        cached = _read_cached(day)
+        if cached is not None:
+            print(f"[Clashn] 使用缓存: {day}")
+            return cached, False
+
+    raise RuntimeError(f"最近 {days + 1} 天的 clashn 节点文件均不可用")
@@ -0,0 +1,82 @@
+"""
+DNS 预热模块
+AI 域名在 DNS 配置中走 DoH，首次访问要付出一次冷查询的延迟。
+核心每次就绪后（首次启动、崩溃重启、蓝绿切换）通过控制器的 /dns/query 并发解析预热列表，
+结果进入核心的 DNS 缓存，并记录每个域名的耗时
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.settings import get_settings
+
+
+class DnsWarmer:
+    """AI 域名 DNS 预热"""
+
+    def __init__(self):
+        cfg = get_settings("dns_warmup")
+        self.enabled = cfg["enabled"]
+        self.domains = list(cfg["domains"])
+        self.concurrency = cfg["concurrency"]
+        self.timeout = cfg["timeout"]
+        self.last = None
+
+    def _resolve(self, controller, domain):
+        started = time.perf_counter()
+        try:
+            answers = controller.dns_query(domain, timeout=self.timeout).get("Answer") or []
+            error = None if answers else "no answer"
+        except Exception as e:
+            answers, error = [], str(e)
+        return domain, {
+            "ms": round((time.perf_counter() - started) * 1000),
+            "ok": bool(answers),
+            "answers": len(answers),
+            "error": error,
+        }
+
+    def warm_up(self, controller):
+        """
+        并发解析预热列表
+
+        Returns:
+            dict: 总耗时与每个域名的耗时/结果
+        """
+        if not self.enabled or not self.domains:
+            return None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(self.domains))) as pool:
+            results = dict(pool.map(lambda d: self._resolve(controller, d), self.domains))
+        total_ms = round((time.perf_counter() - started) * 1000)
+
+        ok = sum(1 for r in results.values() if r["ok"])
+        slowest = max(results, key=lambda d: results[d]["ms"])
+        print(
+            f"[DNS] 预热完成: {ok}/{len(results)} 个域名，耗时 {total_ms}ms"
+            f"（最慢 {slowest} {results[slowest]['ms']}ms）"
+        )
+
+        self.last = {
+            "time": time.time(),
+            "controller": controller.base_url,
+            "total_ms": total_ms,
+            "domains": results,
+        }
+        return self.last
+
+    def status(self):
+        return {"enabled": self.enabled, "domains": self.domains, "last": self.last}
+
+
+# 全局实例
+_warmer = None
+
+
+def get_dns_warmer():
+    """获取全局 DNS 预热器"""
+    global _warmer
+    if _warmer is None:
+        _warmer = DnsWarmer()
+    return _warmer
@@ -0,0 +1,267 @@
+"""
+GeoIP / GeoSite 数据库缓存
+规则中的 GEOIP,CN 与 DNS fallback-filter 依赖 Country.mmdb，核心在缺少数据库时会先下载再提供服务。
+启动器在本地维护一份经过 sha256 校验的缓存，启动核心前直接放入核心工作目录（只做本地复制），
+下载与更新全部在后台线程完成，首次启动不再等待数据库下载。
+清单同时记下缓存文件与已放置文件的大小和修改时间，二者未变时直接信任，启动时不再重新计算哈希
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from core.settings import get_settings
+
+CACHE_DIR = os.path.join("config", "cache", "geo")
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest.json")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_key(path):
+    """[大小, 修改时间 ns]，用列表以便与清单中读回的 JSON 值直接比较；文件不存在时为 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _bundled_path(name):
+    """随程序打包的种子数据库（可选）"""
+    base = getattr(sys, "_MEIPASS", os.getcwd())
+    path = os.path.join(base, "clash", name)
+    return path if os.path.exists(path) else None
+
+
+class GeoDataManager:
+    """数据库缓存：校验、放置与后台更新"""
+
+    def __init__(self):
+        cfg = get_settings("geodata")
+        self.enabled = cfg["enabled"]
+        self.files = cfg["files"]
+        self.refresh_interval = cfg["refresh_interval"]
+        self.manifest = self._load_manifest()
+        self.last_error = None
+        # 本进程内已校验过的缓存文件，避免每次启动核心都重新计算哈希
+        self._verified = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- 清单 ----------
+    def _load_manifest(self):
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if isinstance(manifest, dict):
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_manifest(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = MANIFEST_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, MANIFEST_PATH)
+
+    def _cached(self, name):
+        """缓存中通过校验的文件路径，校验失败的文件直接丢弃"""
+        path = os.path.join(CACHE_DIR, name)
+        entry = self.manifest.get(name)
+        if not entry or not os.path.exists(path):
+            return None
+        if name in self._verified:
+            return path
+        stat = _stat_key(path)
+        if stat == entry.get("stat"):
+            # 写入缓存后文件未被改动过
+            self._verified.add(name)
+            return path
+        if os.path.getsize(path) != entry.get("size") or _sha256(path) != entry.get("sha256"):
+            print(f"[GeoData] ⚠️ {name} 校验失败，已丢弃缓存")
+            os.remove(path)
+            self.manifest.pop(name, None)
+            return None
+        entry["stat"] = stat
+        self._save_manifest()
+        self._verified.add(name)
+        return path
+
+    def _store(self, name, src, sha256):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, name)
+        tmp = path + ".tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, path)
+        self.manifest[name] = {
+            "sha256": sha256,
+            "size": os.path.getsize(path),
+            "stat": _stat_key(path),
+            "updated_at": time.time(),
+        }
+        self._verified.add(name)
+        self._save_manifest()
+
+    # ---------- 放置 ----------
+    def place(self, core_dir):
+        """
+        把缓存的数据库放入核心工作目录（启动核心前调用，只做本地文件操作）
+
+        Returns:
+            list: 已就位的文件名
+        """
+        if not self.enabled:
+            return []
+
+        placed = []
+        with self._lock:
+            # 核心目录中的文件 → 放置时的 sha256 与 (大小, 修改时间)
+            records = self.manifest.setdefault("_placed", {})
+            changed = False
+            for name in self.files:
+                src = self._cached(name)
+                if src is None:
+                    # 没有缓存时使用随程序打包的种子
+                    seed = _bundled_path(name)
+                    if seed is None:
+                        continue
+                    self._store(name, seed, _sha256(seed))
+                    src = os.path.join(CACHE_DIR, name)
+
+                dst = os.path.abspath(os.path.join(core_dir, name))
+                sha256 = self.manifest[name]["sha256"]
+                record = records.get(dst)
+                if record and record["sha256"] == sha256 and record["stat"] == _stat_key(dst):
+                    placed.append(name)
+                    continue
+                try:
+                    tmp = dst + ".tmp"
+                    shutil.copyfile(src, tmp)
+                    os.replace(tmp, dst)
+                    records[dst] = {"sha256": sha256, "stat": _stat_key(dst)}
+                    changed = True
+                    placed.append(name)
+                except OSError as e:
+                    # Windows 下运行中的核心会锁定数据库文件，下次启动时再替换
+                    print(f"[GeoData] ⚠️ 放置 {name} 失败: {e}")
+            if changed:
+                self._save_manifest()
+
+        missing = [name for name in self.files if name not in placed]
+        if missing:
+            print(f"[GeoData] ⚠️ 缺少 {', '.join(missing)}，将在后台下载")
+        return placed
+
+    # ---------- 更新 ----------
+    def _fetch_checksum(self, session, url):
+        response = session.get(url + ".sha256sum", timeout=15)
+        response.raise_for_status()
+        return response.text.split()[0].lower()
+
+    def _download(self, session, name, url, expected):
+        tmp = os.path.join(CACHE_DIR, name + ".download")
+        digest = hashlib.sha256()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with session.get(url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            with open(tmp, "wb") as f:
+                for chunk in response.iter_content(256 * 1024):
+                    digest.update(chunk)
+                    f.write(chunk)
+        if digest.hexdigest() != expected:
+            os.remove(tmp)
+            raise ValueError(f"{name} 校验和不匹配")
+        return tmp
+
+    def refresh(self):
+        """
+        检查并下载新版本数据库（后台线程中调用）
+
+        Returns:
+            list: 本次更新的文件名
+        """
+        import requests
+
+        session = requests.Session()
+        updated = []
+        for name, url in self.files.items():
+            try:
+                expected = self._fetch_checksum(session, url)
+                entry = self.manifest.get(name)
+                if entry and entry.get("sha256") == expected:
+                    entry["checked_at"] = time.time()
+                    continue
+                tmp = self._download(session, name, url, expected)
+                with self._lock:
+                    self._store(name, tmp, expected)
+                os.remove(tmp)
+                updated.append(name)
+                print(f"[GeoData] ✅ 已更新 {name}")
+            except Exception as e:
+                self.last_error = f"{name}: {e}"
+                print(f"[GeoData] ⚠️ 更新 {name} 失败: {e}")
+
+        with self._lock:
+            self.manifest["_checked_at"] = time.time()
+            self._save_manifest()
+        return updated
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "files": {name: self.manifest.get(name) for name in self.files},
+            "checked_at": self.manifest.get("_checked_at"),
+            "last_error": self.last_error,
+        }
+
+    # ---------- 后台线程 ----------
+    def start(self, core_dir=None):
+        if not self.enabled:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(core_dir,), name="geodata", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, core_dir):
+        while True:
+            checked_at = self.manifest.get("_checked_at") or 0
+            missing = any(name not in self.manifest for name in self.files)
+            delay = 0 if missing else checked_at + self.refresh_interval - time.time()
+            if self._stop.wait(max(delay, 0)):
+                return
+            # 缺失时立刻下载并放置，核心可在下次启动或重载时使用
+            if self.refresh() and core_dir:
+                self.place(core_dir)
+            if self._stop.wait(60):
+                return
+
+
+# 全局实例
+_manager = None
+
+
+def get_geodata_manager():
+    """获取全局数据库缓存管理器"""
+    global _manager
+    if _manager is None:
+        _manager = GeoDataManager()
+    return _manager
@@ -0,0 +1,143 @@
+"""
+分层测速模块
+- 热门层：评分最好的 N 个节点，高频测速
+- 冷门层：其余节点按分片轮转，每轮只测一片
+每轮测速数量固定（N + 分片大小），与订阅节点总数无关；
+测速结果更新评分后重新分层，并把最优热门节点设置到「热门节点」组
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.clash_api import get_controller
+from core.load_balance import get_load_balancer
+from core.node_index import get_snapshot
+from core.node_stats import get_node_stats
+from core.settings import get_settings
+from core.yaml_merge import HOT_GROUP
+
+
+class TieredHealthChecker:
+    """热门/冷门分层的后台测速器"""
+
+    def __init__(self, stats=None):
+        cfg = get_settings("health")
+        self.stats = stats or get_node_stats()
+        self.hot_size = cfg["hot_size"]
+        self.hot_interval = cfg["hot_interval"]
+        self.shard_size = cfg["cold_shard_size"]
+        self.cold_interval = cfg["cold_interval"]
+        self.timeout_ms = cfg["timeout_ms"]
+        self.test_url = cfg["test_url"]
+        self.concurrency = cfg["concurrency"]
+
+        self.hot = []
+        self.best = None
+        self.probes = 0
+        self._shard_cursor = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="health-tiers", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def reset(self, controller=None):
+        """核心重启后「热门节点」组回到默认成员，下次划分时重新选定"""
+        self.best = None
+
+    def _loop(self):
+        next_hot = next_cold = 0.0
+        while not self._stop.wait(1):
+            now = time.monotonic()
+            if now < next_hot and now < next_cold:
+                continue
+            try:
+                names = [node["name"] for node in get_snapshot(max_age=self.hot_interval).nodes]
+            except Exception:
+                # Clash 未运行：稍后再试
+                next_hot = next_cold = now + self.hot_interval
+                continue
+
+            if now >= next_hot:
+                self.probe(self.hot or names[:self.hot_size])
+                next_hot = now + self.hot_interval
+            if now >= next_cold:
+                self.probe(self._next_shard(names))
+                next_cold = now + self.cold_interval
+            self.rebalance(names)
+
+    # ---------- 测速与分层 ----------
+    def _next_shard(self, names):
+        hot = set(self.hot)
+        cold = [name for name in names if name not in hot]
+        if not cold:
+            return []
+        start = self._shard_cursor % len(cold)
+        shard = cold[start:start + self.shard_size]
+        if len(shard) < self.shard_size:
+            shard += cold[:self.shard_size - len(shard)]
+        self._shard_cursor = start + self.shard_size
+        return list(dict.fromkeys(shard))
+
+    def probe(self, names):
+        """并发测速一批节点，结果写入节点统计"""
+        if not names:
+            return
+        controller = get_controller()
+
+        def test(name):
+            self.stats.record_delay(name, controller.test_delay(name, self.test_url, self.timeout_ms))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(test, names))
+        self.probes += len(names)
+
+    def rebalance(self, names):
+        """按最新评分重新划分热门层，让「热门节点」组指向最优节点，并分配负载均衡槽位"""
+        ranked = [name for name in self.stats.ranked(names) if self.stats.score(name) != float("inf")]
+        hot = ranked[:self.hot_size]
+
+        promoted = set(hot) - set(self.hot)
+        if self.hot and promoted:
+            print(f"[Health] 热门层更新: +{len(promoted)} 个节点")
+        self.hot = hot
+
+        if hot and hot[0] != self.best:
+            try:
+                if get_controller().select_proxy(HOT_GROUP, hot[0]):
+                    self.best = hot[0]
+            except Exception as e:
+                print(f"[Health] ⚠️ 设置热门节点失败: {e}")
+
+        get_load_balancer().rebalance(ranked)
+
+    def status(self):
+        return {
+            "hot": [{"name": name, "score_ms": self.stats.score(name)} for name in self.hot],
+            "best": self.best,
+            "probes": self.probes,
+            "hot_interval": self.hot_interval,
+            "cold_interval": self.cold_interval,
+            "cold_shard_size": self.shard_size,
+        }
+
+
+# 全局实例
+_checker = None
+
+
+def get_health_checker():
+    """获取全局分层测速器"""
+    global _checker
+    if _checker is None:
+        _checker = TieredHealthChecker()
+    return _checker
@@ -0,0 +1,174 @@
+"""
+负载均衡槽位管理
+配置中的「负载均衡」组把连接分摊到固定数量的 select 槽位（策略见 merge.lb_strategy）；
+核心每次就绪时先按已保存的评分（没有评分时按订阅顺序）把各槽位分到不同的节点，不依赖分层测速是否开启；
+之后分层测速每轮重新评分，启动器把评分最好的节点放进各槽位：
+仍然健康的槽位保持原节点不动（已建立的会话不被打散），只替换掉掉线或明显变差的槽位
+"""
+
+import threading
+import time
+
+from core.clash_api import get_controller
+from core.node_index import GROUP_TYPES
+from core.node_stats import get_node_stats
+from core.settings import get_settings
+from core.yaml_merge import LB_GROUP, LB_STRATEGIES, lb_slot_names, lb_strategy
+
+
+class LoadBalancer:
+    """负载均衡槽位分配与流量分布统计"""
+
+    def __init__(self):
+        cfg = get_settings("merge")
+        self.enabled = cfg["load_balance"]
+        self.slots = lb_slot_names(cfg["lb_size"])
+        self.domains = list(cfg["lb_domains"])
+        self.strategy = lb_strategy(cfg)
+        # 槽位 → 节点（启动器最近一次设置的结果）
+        self.assigned = {}
+        self.last_rebalance = None
+        self._lock = threading.Lock()
+
+    def reset(self, controller=None):
+        """
+        on_ready 回调：核心重启后槽位都回到同一个默认成员，清空记录并立即重新分配，
+        否则关闭分层测速时负载均衡组的所有连接都会落在这一个节点上
+        """
+        with self._lock:
+            self.assigned.clear()
+        if self.enabled and controller is not None:
+            self.assign_initial(controller)
+
+    def assign_initial(self, controller):
+        """
+        按节点统计的评分把各槽位分到不同的节点（未测速的节点保持订阅顺序）
+
+        Returns:
+            int: 设置成功的槽位数
+        """
+        try:
+            proxies = controller.get_proxies(timeout=2)
+        except Exception as e:
+            print(f"[LoadBalance] ⚠️ 读取槽位失败: {e}")
+            return 0
+        members = (proxies.get(self.slots[0]) or {}).get("all") or []
+        names = [name for name in members if proxies.get(name, {}).get("type") not in GROUP_TYPES]
+        changed = 0
+        with self._lock:
+            for slot, node in zip(self.slots, get_node_stats().ranked(names)):
+                try:
+                    if controller.select_proxy(slot, node, timeout=2):
+                        self.assigned[slot] = node
+                        changed += 1
+                except Exception as e:
+                    print(f"[LoadBalance] ⚠️ 设置 {slot} 失败: {e}")
+            self.last_rebalance = time.time()
+        if changed:
+            print(f"[LoadBalance] 已初始分配 {changed}/{len(self.slots)} 个槽位")
+        return changed
+
+    def _load_current(self, controller):
+        for slot in self.slots:
+            if slot in self.assigned:
+                continue
+            try:
+                self.assigned[slot] = controller.get_proxy(slot, timeout=2).get("now")
+            except Exception:
+                # 当前配置没有该槽位（未开启负载均衡或核心未就绪）
+                return False
+        return True
+
+    def rebalance(self, ranked):
+        """
+        按评分分配槽位
+
+        Args:
+            ranked: 按评分排好序的健康节点名
+
+        Returns:
+            int: 本次切换的槽位数
+        """
+        if not self.enabled or not ranked:
+            return 0
+
+        controller = get_controller()
+        size = len(self.slots)
+        # 留出一倍的容差带，避免评分小幅波动导致槽位来回切换
+        keep = set(ranked[:size * 2])
+        changed = 0
+        with self._lock:
+            if not self._load_current(controller):
+                return 0
+            kept = {}
+            for slot in self.slots:
+                node = self.assigned.get(slot)
+                # 同一节点只占一个槽位
+                if node in keep and node not in kept.values():
+                    kept[slot] = node
+            candidates = (name for name in ranked if name not in kept.values())
+            for slot in self.slots:
+                if slot in kept:
+                    continue
+                node = next(candidates, None)
+                if node is None:
+                    break
+                try:
+                    if controller.select_proxy(slot, node, timeout=2):
+                        self.assigned[slot] = node
+                        changed += 1
+                except Exception as e:
+                    print(f"[LoadBalance] ⚠️ 设置 {slot} 失败: {e}")
+            self.last_rebalance = time.time()
+
+        if changed:
+            print(f"[LoadBalance] 已更新 {changed}/{size} 个槽位")
+        return changed
+
+    def distribution(self, controller=None):
+        """
+        当前经负载均衡组的连接在各节点上的分布
+
+        Returns:
+            dict: 每个节点的连接数、上下行字节数与目标主机数
+        """
+        controller = controller or get_controller()
+        nodes = {}
+        total = 0
+        for conn in controller.get_connections():
+            chains = conn.get("chains") or []
+            if LB_GROUP not in chains:
+                continue
+            entry = nodes.setdefault(chains[0], {"connections": 0, "upload": 0, "download": 0, "hosts": set()})
+            entry["connections"] += 1
+            entry["upload"] += conn.get("upload", 0)
+            entry["download"] += conn.get("download", 0)
+            entry["hosts"].add((conn.get("metadata") or {}).get("host") or "")
+            total += 1
+
+        for entry in nodes.values():
+            entry["hosts"] = len(entry["hosts"])
+            entry["share"] = round(entry["connections"] / total, 3) if total else 0
+        return {"total": total, "nodes": nodes}
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "domains": self.domains,
+            "strategy": self.strategy,
+            "strategy_note": LB_STRATEGIES.get(self.strategy),
+            "slots": {slot: self.assigned.get(slot) for slot in self.slots},
+            "last_rebalance": self.last_rebalance,
+        }
+
+
+# 全局实例
+_balancer = None
+
+
+def get_load_balancer():
+    """获取全局负载均衡槽位管理器"""
+    global _balancer
+    if _balancer is None:
+        _balancer = LoadBalancer()
+    return _balancer
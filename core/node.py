@@ -0,0 +1,246 @@
+"""
+节点模型
+合并订阅时每个节点只保存固定的几个槽位：name/type/server/port 直接存放，其余字段的键序列在所有
+同构节点之间共享、值存成一个元组；常见取值（类型、地址、加密方式、传输协议等）做字符串驻留，
+ws-opts 之类的嵌套映射冻结成只读元组后在取值相同的节点之间共用同一个对象，读取时再还原。
+驻留表（NodeInterner）由每次合并各自创建、合并结束即丢弃，定时更新订阅不会让旧订阅的内容常驻内存。
+校验在构造时完成一次，之后的去重、分组、写出配置都不再逐项检查
+
+python -m core.node 可以对比同一份订阅按普通 dict 与按节点加载后常驻的内存
+"""
+
+# 取值重复率很高的字段，驻留后所有节点共用同一个字符串对象
+INTERNED_FIELDS = frozenset({
+    "type", "cipher", "network", "protocol", "obfs", "plugin", "flow", "servername", "sni",
+    "client-fingerprint", "congestion-controller", "udp-relay-mode",
+})
+
+# 决定出口身份的字段：凭据之外，传输层（ws/grpc/h2 路径与 Host、SNI、插件参数等）不同的节点
+# 即使地址端口相同也是不同的出口
+IDENTITY_FIELDS = (
+    "uuid", "password", "cipher", "network", "tls", "servername", "sni",
+    "ws-opts", "grpc-opts", "h2-opts", "http-opts", "reality-opts",
+    "plugin", "plugin-opts", "obfs", "obfs-param", "protocol", "protocol-param", "flow",
+)
+
+
+
+class InvalidNode(ValueError):
+    """节点缺少必要字段或字段不合法"""
+
+
+class FrozenMap(tuple):
+    """冻结的映射：(键, 值) 对组成的元组"""
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(other) is FrozenMap and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((FrozenMap, tuple.__hash__(self)))
+
+
+class FrozenList(tuple):
+    """冻结的列表"""
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(other) is FrozenList and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((FrozenList, tuple.__hash__(self)))
+
+
+class NodeInterner:
+    """
+    一次合并内共用的驻留表：字段键序列、常见字符串与冻结后的嵌套取值。
+    调用方为每次合并创建一个，节点建完即可丢弃，已驻留的对象由节点自己引用
+    """
+
+    __slots__ = ("_layouts", "_strings", "_shared")
+
+    def __init__(self):
+        self._layouts = {}
+        self._strings = {}
+        self._shared = {}
+
+    def layout(self, keys):
+        return self._layouts.setdefault(keys, keys)
+
+    def string(self, value):
+        return self._strings.setdefault(value, value)
+
+    def freeze(self, value):
+        """把嵌套的 dict/list 冻结成可哈希的只读形式，取值相同的返回同一个对象"""
+        if isinstance(value, dict):
+            frozen = FrozenMap((self.string(str(k)), self.freeze(v)) for k, v in value.items())
+        elif isinstance(value, list):
+            frozen = FrozenList(self.freeze(v) for v in value)
+        elif isinstance(value, str):
+            return self.string(value) if len(value) <= 64 else value
+        else:
+            return value
+        return self._shared.setdefault(frozen, frozen)
+
+
+def _thaw(value):
+    """还原成普通的 dict/list（调用方修改返回值不会影响共享对象）"""
+    if type(value) is FrozenMap:
+        return {k: _thaw(v) for k, v in value}
+    if type(value) is FrozenList:
+        return [_thaw(v) for v in value]
+    return value
+
+
+class Node:
+    """紧凑的 Clash 节点"""
+
+    __slots__ = ("name", "type", "server", "port", "_keys", "_values", "_hash")
+
+    def __init__(self, name, type, server, port, extra=None, interner=None):
+        if not name:
+            raise InvalidNode("missing name")
+        if not type or not isinstance(type, str):
+            raise InvalidNode("missing type")
+        if not server or not isinstance(server, str):
+            raise InvalidNode("missing server")
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            raise InvalidNode(f"invalid port: {port!r}")
+        if not 0 < port < 65536:
+            raise InvalidNode(f"invalid port: {port}")
+
+        interner = interner or NodeInterner()
+        self.name = str(name)
+        self.type = interner.string(type.lower())
+        self.server = interner.string(server)
+        self.port = port
+
+        extra = extra or {}
+        self._keys = interner.layout(tuple(extra))
+        self._values = tuple(
+            interner.string(value) if key in INTERNED_FIELDS and isinstance(value, str)
+            else interner.freeze(value) if isinstance(value, (dict, list))
+            else value
+            for key, value in extra.items()
+        )
+        self._hash = hash(self.identity())
+
+    @classmethod
+    def from_clash(cls, data, interner=None):
+        """从 Clash 的 proxies 条目构造（同一次合并的节点传入同一个 interner 才能共享取值）"""
+        if not isinstance(data, dict):
+            raise InvalidNode("not a mapping")
+        extra = {k: v for k, v in data.items() if k not in ("name", "type", "server", "port")}
+        return cls(data.get("name"), data.get("type"), data.get("server"), data.get("port"), extra, interner)
+
+    # ---------- 字段访问 ----------
+    def _raw(self, key, default=None):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            return default
+
+    def get(self, key, default=None):
+        if key in ("name", "type", "server", "port"):
+            return getattr(self, key)
+        return _thaw(self._raw(key, default))
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def items(self):
+        """按 Clash 配置的字段顺序产出键值（供 yaml 直接序列化）"""
+        yield "name", self.name
+        yield "type", self.type
+        yield "server", self.server
+        yield "port", self.port
+        for key, value in zip(self._keys, self._values):
+            yield key, _thaw(value)
+
+    def to_clash(self):
+        return dict(self.items())
+
+    # ---------- 身份 ----------
+    def identity(self):
+        """同一个出口：类型 + 地址 + 端口 + 凭据与传输参数（节点名不参与）"""
+        return (self.type, self.server, self.port) + tuple(self._raw(key) for key in IDENTITY_FIELDS)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self._hash == other._hash and self.identity() == other.identity()
+
+    def __repr__(self):
+        return f"Node({self.name!r}, {self.type}, {self.server}:{self.port})"
+
+
+def represent_node(dumper, node):
+    """yaml representer：节点按普通映射写出，不先转换成 dict"""
+    return dumper.represent_dict(node)
+
+
+def _benchmark(count=20000):
+    """同一份订阅分别按 dict 与按节点加载，对比每个节点常驻的内存"""
+    import gc
+    import tracemalloc
+
+    import yaml
+
+    lines = ["proxies:"]
+    for i in range(count):
+        lines.append(
+            f"""  - name: "🇭🇰 香港 {i:05d} | IPLC"
+    type: vmess
+    server: cdn{i % 50}.example.com
+    port: 443
+    uuid: {i:08x}-1234-5678-9abc-{i * 7919:012x}
+    alterId: 0
+    cipher: auto
+    tls: true
+    skip-cert-verify: false
+    servername: sni{i % 20}.example.com
+    network: ws
+    udp: true
+    ws-opts:
+      path: /ray{i % 10}
+      headers:
+        Host: sni{i % 20}.example.com"""
+        )
+    text = "\n".join(lines)
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+    def retained(build):
+        gc.collect()
+        tracemalloc.start()
+        objs = build()
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return current / len(objs), objs
+
+    as_dict, _ = retained(lambda: yaml.load(text, Loader=loader)["proxies"])
+    interner = NodeInterner()
+    as_node, nodes = retained(
+        lambda: [Node.from_clash(x, interner) for x in yaml.load(text, Loader=loader)["proxies"]]
+    )
+    print(f"dict {as_dict:.0f}B/节点  Node {as_node:.0f}B/节点  {as_dict / as_node:.1f}x  去重后 {len(set(nodes))}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,298 @@
+"""
+节点快照与索引
+对 /proxies 数据建立一次索引（类型、地区、名称三元组、各排序键的有序序列），
+之后的筛选、排序、分页都基于索引完成，不再对全部节点逐个扫描排序
+"""
+
+import base64
+import bisect
+import itertools
+import threading
+import time
+
+from core.clash_api import SELECTOR_GROUP, get_controller
+from core.regions import classify_region
+
+# Clash 中代理组及内置出站的类型，不作为节点展示
+GROUP_TYPES = {
+    "Selector", "URLTest", "Fallback", "LoadBalance", "Relay",
+    "Direct", "Reject", "RejectDrop", "Compatible", "Pass",
+}
+
+SORT_KEYS = ("default", "delay", "name", "loss")
+
+# 快照版本号：节点增减或顺序变化、重建索引时递增，写进分页游标；延迟与丢包只是实时取值，不改变版本
+_versions = itertools.count(1)
+
+
+class StaleCursor(ValueError):
+    """游标来自已被替换的快照，继续翻页会跳过或重复节点"""
+
+
+def _last_delay(history):
+    if history and isinstance(history[-1], dict):
+        delay = history[-1].get("delay", 0)
+        if delay > 0:
+            return delay
+    return None
+
+
+def _loss(history):
+    """历史测速中失败（delay 为 0）的比例"""
+    if not history:
+        return None
+    failed = sum(1 for h in history if not (isinstance(h, dict) and h.get("delay", 0) > 0))
+    return round(failed / len(history), 3)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def extract_nodes(proxies, group=SELECTOR_GROUP):
+    """
+    从 /proxies 数据中提取节点列表
+
+    Returns:
+        (str, list): 当前选择的节点与节点列表
+    """
+    selector = proxies.get(group, {})
+    nodes = []
+    for name in selector.get("all", []):
+        info = proxies.get(name, {})
+        if info.get("type") in GROUP_TYPES:
+            continue
+        history = info.get("history") or []
+        nodes.append({
+            "name": name,
+            "type": info.get("type", "unknown"),
+            "region": classify_region(name),
+            "delay_ms": _last_delay(history),
+            "loss": _loss(history),
+        })
+    return selector.get("now", ""), nodes
+
+
+def resolve_group(proxies, group):
+    """
+    沿组的 now 逐层解析到实际出口节点
+
+    Returns:
+        dict: 组当前选择、最终节点、选择路径，以及路径上最近一次有效测速的延迟
+        （对「自动」组而言即用该组测速地址测得的延迟）；组不存在时返回 None
+    """
+    info = proxies.get(group)
+    if not info:
+        return None
+    path = []
+    seen = {group}
+    name = info.get("now", "")
+    while name and name not in seen:
+        path.append(name)
+        seen.add(name)
+        name = proxies.get(name, {}).get("now", "")
+
+    delay = None
+    for name in path:
+        delay = _last_delay(proxies.get(name, {}).get("history") or [])
+        if delay is not None:
+            break
+    return {
+        "group": group,
+        "now": info.get("now", ""),
+        "node": path[-1] if path else "",
+        "path": path,
+        "delay_ms": delay,
+    }
+
+
+def make_fingerprint(nodes):
+    """节点成员与顺序的指纹（测速结果不参与，每轮测速不会让游标失效）"""
+    return hash(tuple(n["name"] for n in nodes))
+
+
+def _live_values(nodes):
+    return tuple((n["delay_ms"], n["loss"]) for n in nodes)
+
+
+def _ranks(order):
+    """order 中各节点的位置：rank[i] 为节点 i 在 order 中的下标"""
+    rank = [0] * len(order)
+    for position, i in enumerate(order):
+        rank[i] = position
+    return rank
+
+
+class NodeSnapshot:
+    """某一时刻的节点列表及其索引"""
+
+    def __init__(self, nodes, current=""):
+        self.current = current
+        self.nodes = nodes
+        self.fingerprint = make_fingerprint(nodes)
+        self.version = next(_versions)
+        self._build_indexes()
+
+    def update_live(self, nodes):
+        """
+        节点成员不变时换上最新的延迟与丢包，只重建依赖它们的排序与延迟区间索引，版本号不变。
+        按延迟或丢包排序翻页时，两页之间的测速可能让节点换位，这是实时取值的代价
+        """
+        if _live_values(nodes) == self.live:
+            return
+        self.nodes = nodes
+        self._build_live_indexes()
+
+    def _build_indexes(self):
+        nodes = self.nodes
+        count = len(nodes)
+        self.lower_names = [n["name"].lower() for n in nodes]
+
+        self.by_type = {}
+        self.by_region = {}
+        self.by_trigram = {}
+        for i, node in enumerate(nodes):
+            self.by_type.setdefault(node["type"].lower(), set()).add(i)
+            self.by_region.setdefault(node["region"], set()).add(i)
+            for gram in _trigrams(self.lower_names[i]):
+                self.by_trigram.setdefault(gram, set()).add(i)
+
+        self.order = {
+            "default": list(range(count)),
+            "name": sorted(range(count), key=lambda i: (self.lower_names[i], i)),
+        }
+        self.rank = {key: _ranks(order) for key, order in self.order.items()}
+        self._build_live_indexes()
+
+    def _build_live_indexes(self):
+        """延迟、丢包相关的索引：先在局部建好再整体替换，并发的查询不会看到建了一半的索引"""
+        nodes = self.nodes
+        count = len(nodes)
+        # 未测速 / 无数据的节点排在最后
+        far = float("inf")
+        order = dict(self.order)
+        order["delay"] = sorted(range(count), key=lambda i: (nodes[i]["delay_ms"] or far, i))
+        order["loss"] = sorted(range(count), key=lambda i: (far if nodes[i]["loss"] is None else nodes[i]["loss"], i))
+        rank = dict(self.rank)
+        rank["delay"] = _ranks(order["delay"])
+        rank["loss"] = _ranks(order["loss"])
+
+        # 已测速节点的延迟有序表，用于延迟区间筛选
+        measured = [i for i in order["delay"] if nodes[i]["delay_ms"] is not None]
+        self.order, self.rank = order, rank
+        self.delay_keys = [nodes[i]["delay_ms"] for i in measured]
+        self.delay_ids = measured
+        self.live = _live_values(nodes)
+
+    # ---------- 筛选 ----------
+    def _match_name(self, query):
+        query = query.lower()
+        if len(query) < 3:
+            return {i for i, name in enumerate(self.lower_names) if query in name}
+
+        candidates = None
+        for gram in _trigrams(query):
+            ids = self.by_trigram.get(gram)
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates & ids
+        return {i for i in candidates if query in self.lower_names[i]}
+
+    def _match_delay(self, min_delay, max_delay):
+        lo = 0 if min_delay is None else bisect.bisect_left(self.delay_keys, min_delay)
+        hi = len(self.delay_keys) if max_delay is None else bisect.bisect_right(self.delay_keys, max_delay)
+        return set(self.delay_ids[lo:hi])
+
+    def query(self, q=None, node_type=None, region=None, min_delay=None, max_delay=None,
+              sort="default", desc=False, offset=0, limit=0):
+        """
+        筛选 + 排序 + 分页
+
+        Returns:
+            (list, int): 当前页节点与符合条件的总数
+        """
+        filters = []
+        if node_type:
+            filters.append(self.by_type.get(node_type.lower(), set()))
+        if region:
+            filters.append(self.by_region.get(region.upper(), set()))
+        if min_delay is not None or max_delay is not None:
+            filters.append(self._match_delay(min_delay, max_delay))
+        if q:
+            filters.append(self._match_name(q))
+
+        order = self.order[sort if sort in self.order else "default"]
+        if filters:
+            # 从最小的集合开始求交集
+            filters.sort(key=len)
+            matched = set(filters[0])
+            for ids in filters[1:]:
+                matched &= ids
+            rank = self.rank[sort if sort in self.rank else "default"]
+            ids = sorted(matched, key=rank.__getitem__, reverse=desc)
+        else:
+            ids = order[::-1] if desc else order
+
+        total = len(ids)
+        end = offset + limit if limit else total
+        return [self.nodes[i] for i in ids[offset:end]], total
+
+
+# =====================================================
+# 游标
+# =====================================================
+def encode_cursor(offset, version=0):
+    """游标 = 快照版本 + 偏移"""
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, version=None):
+    """
+    解析游标得到偏移；给出 version 时，游标不属于该版本的快照则抛出 StaleCursor
+    """
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_version, _, offset = raw.partition(":")
+        cursor_version, offset = int(cursor_version), int(offset)
+    except (ValueError, TypeError):
+        raise ValueError("无效的分页游标")
+    if version is not None and cursor_version != version:
+        raise StaleCursor("节点列表已更新，请从头加载")
+    return max(offset, 0)
+
+
+# =====================================================
+# 快照缓存
+# =====================================================
+_snapshot = None
+_snapshot_time = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(max_age=2.0):
+    """
+    获取节点快照：max_age 秒内复用；重新拉取后节点成员与顺序未变化时沿用已有快照与版本，
+    只原地刷新延迟与丢包
+    """
+    global _snapshot, _snapshot_time
+
+    with _snapshot_lock:
+        if _snapshot is not None and time.monotonic() - _snapshot_time < max_age:
+            return _snapshot
+
+        current, nodes = extract_nodes(get_controller().get_proxies())
+        if _snapshot is not None and _snapshot.fingerprint == make_fingerprint(nodes):
+            _snapshot.current = current
+            _snapshot.update_live(nodes)
+        else:
+            _snapshot = NodeSnapshot(nodes, current)
+        _snapshot_time = time.monotonic()
+        return _snapshot
+
+
+def invalidate_snapshot():
+    """让下一次查询重新拉取（例如切换节点之后）"""
+    global _snapshot_time
+    _snapshot_time = 0.0
@@ -0,0 +1,173 @@
+"""
+节点统计模块
+集中保存启动器自己测得的节点数据（延迟、失败次数等），供分层测速、排序与持久化使用
+"""
+
+import threading
+import time
+
+# 延迟指数滑动平均系数
+EWMA_ALPHA = 0.3
+# 每次连续失败在评分上的惩罚（毫秒）
+FAILURE_PENALTY_MS = 1000
+
+
+class NodeStats:
+    """线程安全的节点统计表"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        # 每次记录递增，持久化时据此跳过未变化的统计
+        self.version = 0
+        # 自上次保存以来变化过的节点与已移除的节点，持久化时只写这些行
+        self._dirty = set()
+        self._removed = set()
+
+    def _entry(self, name):
+        self._dirty.add(name)
+        entry = self._stats.get(name)
+        if entry is None:
+            entry = self._stats[name] = {
+                "delay_ms": None,
+                "ewma_ms": None,
+                "failures": 0,
+                "checks": 0,
+                "last_checked": None,
+                # 经该节点访问各主机的首字节时间 {host: {ttfb_ms, ewma_ms, failures}}
+                "ttfb": {},
+                # 最近一次带宽测速 {kbps, ttfb_ms, bytes, tested_at}，失败时 kbps 为 None
+                "speed": None,
+            }
+        return entry
+
+    @staticmethod
+    def _copy(entry):
+        return dict(
+            entry,
+            ttfb={host: dict(v) for host, v in entry["ttfb"].items()},
+            speed=dict(entry["speed"]) if entry["speed"] else None,
+        )
+
+    def record_delay(self, name, delay_ms):
+        """记录一次测速结果，delay_ms 为 None 表示失败"""
+        with self._lock:
+            self.version += 1
+            entry = self._entry(name)
+            entry["checks"] += 1
+            entry["last_checked"] = time.time()
+            if delay_ms:
+                entry["delay_ms"] = delay_ms
+                entry["failures"] = 0
+                previous = entry["ewma_ms"]
+                entry["ewma_ms"] = delay_ms if previous is None else round(
+                    EWMA_ALPHA * delay_ms + (1 - EWMA_ALPHA) * previous, 1
+                )
+            else:
+                entry["failures"] += 1
+
+    def record_ttfb(self, name, host, ttfb_ms):
+        """记录一次经该节点访问 host 的首字节时间，ttfb_ms 为 None 表示失败"""
+        with self._lock:
+            self.version += 1
+            hosts = self._entry(name)["ttfb"]
+            entry = hosts.setdefault(host, {"ttfb_ms": None, "ewma_ms": None, "failures": 0})
+            if ttfb_ms:
+                entry["ttfb_ms"] = ttfb_ms
+                entry["failures"] = 0
+                previous = entry["ewma_ms"]
+                entry["ewma_ms"] = ttfb_ms if previous is None else round(
+                    EWMA_ALPHA * ttfb_ms + (1 - EWMA_ALPHA) * previous, 1
+                )
+            else:
+                entry["failures"] += 1
+
+    def record_speed(self, name, kbps, ttfb_ms, received):
+        """记录一次带宽测速，kbps 为 None 表示失败"""
+        with self._lock:
+            self.version += 1
+            self._entry(name)["speed"] = {
+                "kbps": kbps,
+                "ttfb_ms": ttfb_ms,
+                "bytes": received,
+                "tested_at": time.time(),
+            }
+
+    def restore(self, snapshot):
+        """载入持久化的统计（已有的条目以内存中的为准）"""
+        with self._lock:
+            for name, saved in snapshot.items():
+                if name in self._stats:
+                    continue
+                entry = self._entry(name)
+                entry.update({key: value for key, value in saved.items() if key in entry})
+                # 与已保存的内容相同，不需要写回
+                self._dirty.discard(name)
+            self.version += 1
+
+    def prune(self, names):
+        """
+        删除不在 names 中的节点（已从订阅中消失），返回删除的数量
+        定时更新订阅时节点名不断变化，不清理的话统计表与数据库会无限增长
+        """
+        keep = set(names)
+        with self._lock:
+            gone = [name for name in self._stats if name not in keep]
+            for name in gone:
+                del self._stats[name]
+                self._dirty.discard(name)
+                self._removed.add(name)
+            if gone:
+                self.version += 1
+        return len(gone)
+
+    def pop_changes(self):
+        """
+        取出自上次调用以来的变化，供持久化增量写入
+
+        Returns:
+            (dict, set): 变化的节点 {名称: 统计副本} 与已删除的节点名
+        """
+        with self._lock:
+            changed = {name: self._copy(self._stats[name]) for name in self._dirty if name in self._stats}
+            removed = self._removed
+            self._dirty, self._removed = set(), set()
+        return changed, removed
+
+    def requeue(self, changed, removed):
+        """写入失败时把取出的变化放回，下次保存重试"""
+        with self._lock:
+            self._dirty.update(name for name in changed if name in self._stats)
+            self._removed.update(name for name in removed if name not in self._stats)
+
+    def score(self, name):
+        """评分越低越好；从未测通的节点为无穷大"""
+        entry = self._stats.get(name)
+        if entry is None or entry["ewma_ms"] is None:
+            return float("inf")
+        return entry["ewma_ms"] + FAILURE_PENALTY_MS * entry["failures"]
+
+    def ranked(self, names):
+        """按评分排序"""
+        return sorted(names, key=self.score)
+
+    def get(self, name):
+        with self._lock:
+            entry = self._stats.get(name)
+            return self._copy(entry) if entry else None
+
+    def snapshot(self):
+        with self._lock:
+            return {name: self._copy(entry) for name, entry in self._stats.items()}
+
+
+# 全局实例
+_node_stats = None
+
+
+def get_node_stats():
+    """获取全局节点统计表"""
+    global _node_stats
+    if _node_stats is None:
+        _node_stats = NodeStats()
+    return _node_stats
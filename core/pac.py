@@ -0,0 +1,156 @@
+"""
+PAC 文件生成模块
+根据 merge_subscriptions 生成的规则（DIRECT / 代理）生成 PAC 脚本：
+- 域名用后缀字典逐级查找，不做逐条字符串比较
+- 每条规则带上它在规则列表中的序号，同时命中多条时取序号最小的一条，结果与 Clash 按顺序匹配一致
+- 只对 IP 字面量匹配 IP-CIDR，PAC 内不触发 DNS 解析
+- 结果按配置文件版本缓存，ETag 随配置与端口变化
+"""
+
+import hashlib
+import ipaddress
+import json
+import os
+import threading
+
+# 规则类型 → PAC 中的查找表
+_DOMAIN_RULES = {"DOMAIN", "DOMAIN-SUFFIX", "DOMAIN-KEYWORD"}
+_CIDR_RULES = {"IP-CIDR", "IP-CIDR6"}
+
+_PAC_TEMPLATE = """// 由 AI Proxy Launcher 生成，配置版本 %(version)s
+var P = "PROXY 127.0.0.1:%(port)d";
+var FINAL = %(final)s;
+var E = %(exact)s;
+var S = %(suffix)s;
+var K = %(keyword)s;
+var C = %(cidr)s;
+var IPV4 = /^\\d+\\.\\d+\\.\\d+\\.\\d+$/;
+
+function pick(direct) { return direct ? "DIRECT" : P; }
+
+// 查找表的值都是 [规则序号, 是否直连]，best 保留序号最小的命中
+function FindProxyForURL(url, host) {
+    host = host.toLowerCase();
+    if (isPlainHostName(host)) return "DIRECT";
+    var best = E.hasOwnProperty(host) ? E[host] : null;
+
+    var s = host;
+    while (true) {
+        if (S.hasOwnProperty(s) && (!best || S[s][0] < best[0])) best = S[s];
+        var i = s.indexOf(".");
+        if (i < 0) break;
+        s = s.substring(i + 1);
+    }
+
+    // K、C 按序号排列，遇到比当前命中更靠后的规则即可停止
+    for (var k = 0; k < K.length; k++) {
+        if (best && K[k][1] > best[0]) break;
+        if (host.indexOf(K[k][0]) >= 0) { best = [K[k][1], K[k][2]]; break; }
+    }
+
+    if (IPV4.test(host)) {
+        for (var c = 0; c < C.length; c++) {
+            if (best && C[c][2] > best[0]) break;
+            if (isInNet(host, C[c][0], C[c][1])) { best = [C[c][2], C[c][3]]; break; }
+        }
+    }
+    return best ? pick(best[1]) : FINAL;
+}
+"""
+
+
+def build_pac(rules, port=7890, version=""):
+    """
+    由 Clash 规则生成 PAC 脚本
+
+    规则按在列表中的顺序生效：一个主机同时命中多条规则（如先出现的短后缀与后出现的精确域名）时，
+    取最先出现的一条，与 Clash 一致。GEOIP 等 PAC 无法表达的规则交给 MATCH 兜底。
+    """
+    exact, suffix, keyword, cidr = {}, {}, [], []
+    seen_keywords = set()
+    final_direct = False
+
+    for index, rule in enumerate(rules):
+        parts = [p.strip() for p in str(rule).split(",")]
+        if len(parts) < 2:
+            continue
+        rule_type = parts[0].upper()
+
+        if rule_type == "MATCH":
+            final_direct = parts[1] == "DIRECT"
+            break
+        if len(parts) < 3 or parts[2] == "REJECT":
+            continue
+
+        value, direct = parts[1].lower(), 1 if parts[2] == "DIRECT" else 0
+
+        if rule_type == "DOMAIN":
+            exact.setdefault(value, [index, direct])
+        elif rule_type == "DOMAIN-SUFFIX":
+            suffix.setdefault(value, [index, direct])
+        elif rule_type == "DOMAIN-KEYWORD":
+            if value not in seen_keywords:
+                seen_keywords.add(value)
+                keyword.append([value, index, direct])
+        elif rule_type in _CIDR_RULES:
+            try:
+                network = ipaddress.ip_network(value, strict=False)
+            except ValueError:
+                continue
+            if network.version == 4:
+                cidr.append([str(network.network_address), str(network.netmask), index, direct])
+
+    compact = {"separators": (",", ":"), "ensure_ascii": False}
+    return _PAC_TEMPLATE % {
+        "version": version,
+        "port": port,
+        "final": '"DIRECT"' if final_direct else "P",
+        "exact": json.dumps(exact, **compact),
+        "suffix": json.dumps(suffix, **compact),
+        "keyword": json.dumps(keyword, **compact),
+        "cidr": json.dumps(cidr, **compact),
+    }
+
+
+class PacCache:
+    """按配置文件版本缓存 PAC 内容"""
+
+    def __init__(self):
+        self._key = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self, config_path, port=7890):
+        """
+        Returns:
+            (str, str): PAC 内容与 ETag
+        """
+        stat = os.stat(config_path)
+        key = (config_path, stat.st_mtime_ns, stat.st_size, port)
+
+        with self._lock:
+            if key == self._key:
+                return self._value
+
+            import yaml
+
+            with open(config_path, "rb") as f:
+                raw = f.read()
+            version = hashlib.sha1(raw).hexdigest()[:12]
+            config_data = yaml.safe_load(raw) or {}
+
+            body = build_pac(config_data.get("rules") or [], port, version)
+            etag = f'"{version}-{port}"'
+
+            self._key = key
+            self._value = (body, etag)
+            return self._value
+
+
+# 全局缓存
+_pac_cache = PacCache()
+
+
+def get_pac(config_path, port=7890):
+    """获取（缓存的）PAC 内容与 ETag"""
+    return _pac_cache.get(config_path, port)
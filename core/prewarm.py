@@ -0,0 +1,131 @@
+"""
+切换节点后的连接预热
+先把新节点钉在专用的「预热」组上，再经该组独占的本机入口对 AI 服务主机并发发起
+CONNECT + TLS 握手 + HEAD 请求，让新节点上的首个真实请求不再承担全部握手开销；同时记录每个主机
+经该节点的首字节时间（TTFB），作为比 generate_204 更贴近实际使用的分服务延迟信号。
+不走 mixed-port：那里的流量按规则分流，AI 主机实际出站的往往是别的组，测得的 TTFB 不属于该节点
+"""
+
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.clash_api import get_controller
+from core.node_stats import get_node_stats
+from core.settings import get_settings
+from core.yaml_merge import PREWARM_GROUP
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000)
+
+
+class ConnectionPrewarmer:
+    """经预热组的连接预热与 TTFB 测量"""
+
+    def __init__(self, stats=None):
+        cfg = get_settings("prewarm")
+        self.stats = stats or get_node_stats()
+        self.enabled = cfg["enabled"]
+        self.hosts = list(cfg["hosts"])
+        self.timeout = cfg["timeout"]
+        self.concurrency = cfg["concurrency"]
+        self.port = cfg["port"]
+        self.last = None
+        self._ssl = ssl.create_default_context()
+        # 预热组同一时间只能钉住一个节点
+        self._lock = threading.Lock()
+
+    def probe(self, host, port):
+        """
+        经本机 port 入口 CONNECT → TLS → HEAD，返回各阶段耗时（毫秒）；失败时带 error
+        """
+        hostname, _, target_port = host.partition(":")
+        target_port = int(target_port or 443)
+        result = {"connect_ms": None, "tls_ms": None, "ttfb_ms": None, "error": None}
+        started = time.perf_counter()
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=self.timeout) as sock:
+                sock.sendall(
+                    f"CONNECT {hostname}:{target_port} HTTP/1.1\r\nHost: {hostname}:{target_port}\r\n\r\n".encode()
+                )
+                reply = b""
+                while b"\r\n\r\n" not in reply:
+                    chunk = sock.recv(1024)
+                    if not chunk:
+                        raise ConnectionError("代理关闭了连接")
+                    reply += chunk
+                if not reply.startswith((b"HTTP/1.1 200", b"HTTP/1.0 200")):
+                    raise ConnectionError(reply.split(b"\r\n", 1)[0].decode(errors="ignore"))
+                result["connect_ms"] = _elapsed_ms(started)
+
+                with self._ssl.wrap_socket(sock, server_hostname=hostname) as tls:
+                    result["tls_ms"] = _elapsed_ms(started)
+                    tls.sendall(
+                        f"HEAD / HTTP/1.1\r\nHost: {hostname}\r\nConnection: close\r\n\r\n".encode()
+                    )
+                    if not tls.recv(1):
+                        raise ConnectionError("未收到响应")
+                    result["ttfb_ms"] = _elapsed_ms(started)
+        except (OSError, ssl.SSLError, ValueError) as e:
+            result["error"] = str(e) or e.__class__.__name__
+        return result
+
+    def run(self, node, port):
+        """
+        把节点钉在预热组上，经预热入口并发预热所有主机，并把 TTFB 记入节点统计
+
+        Args:
+            node: 节点名
+            port: 活动核心上的预热入口端口
+
+        Returns:
+            dict: 节点、总耗时与每个主机的结果；无法切换预热组时为 None
+        """
+        if not self.hosts:
+            return None
+
+        with self._lock:
+            try:
+                pinned = get_controller().select_proxy(PREWARM_GROUP, node, timeout=2)
+            except Exception:
+                pinned = False
+            if not pinned:
+                # 配置中没有预热组（生成配置时未开启预热）或节点不存在，测得的数据不属于该节点
+                print(f"[Prewarm] ⚠️ 无法把 {node} 切换到 {PREWARM_GROUP} 组，跳过预热")
+                return None
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(self.hosts))) as pool:
+                results = dict(zip(self.hosts, pool.map(lambda h: self.probe(h, port), self.hosts)))
+            total_ms = _elapsed_ms(started)
+
+        for host, result in results.items():
+            self.stats.record_ttfb(node, host, result["ttfb_ms"])
+
+        ok = sum(1 for r in results.values() if r["ttfb_ms"] is not None)
+        print(f"[Prewarm] {node}: {ok}/{len(results)} 个主机预热完成，耗时 {total_ms}ms")
+
+        self.last = {"time": time.time(), "node": node, "total_ms": total_ms, "hosts": results}
+        return self.last
+
+    def run_async(self, node, port):
+        """在后台线程中预热，不阻塞切换节点的响应"""
+        threading.Thread(target=self.run, args=(node, port), name="prewarm", daemon=True).start()
+
+    def status(self):
+        return {"enabled": self.enabled, "hosts": self.hosts, "port": self.port, "last": self.last}
+
+
+# 全局实例
+_prewarmer = None
+
+
+def get_prewarmer():
+    """获取全局连接预热器"""
+    global _prewarmer
+    if _prewarmer is None:
+        _prewarmer = ConnectionPrewarmer()
+    return _prewarmer
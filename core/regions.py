@@ -0,0 +1,112 @@
+"""
+节点地区识别模块
+根据节点名中的国旗 emoji、中英文关键词、国家代码识别地区，匹配器在导入时预编译
+"""
+
+import functools
+import re
+
+# (代码, 中文名, 关键词) —— 顺序即优先级
+REGIONS = [
+    ("HK", "香港", ["香港", "港", "hong kong", "hongkong"]),
+    ("TW", "台湾", ["台湾", "台灣", "臺灣", "台北", "taiwan", "taipei"]),
+    ("JP", "日本", ["日本", "东京", "東京", "大阪", "japan", "tokyo", "osaka"]),
+    ("SG", "新加坡", ["新加坡", "狮城", "singapore"]),
+    ("KR", "韩国", ["韩国", "韓國", "首尔", "korea", "seoul"]),
+    ("US", "美国", ["美国", "美國", "洛杉矶", "硅谷", "纽约", "united states", "america", "los angeles", "san jose", "new york", "seattle"]),
+    ("GB", "英国", ["英国", "伦敦", "united kingdom", "britain", "london"]),
+    ("DE", "德国", ["德国", "法兰克福", "germany", "frankfurt"]),
+    ("FR", "法国", ["法国", "巴黎", "france", "paris"]),
+    ("NL", "荷兰", ["荷兰", "阿姆斯特丹", "netherlands", "amsterdam"]),
+    ("CA", "加拿大", ["加拿大", "canada", "toronto"]),
+    ("AU", "澳大利亚", ["澳大利亚", "澳洲", "悉尼", "australia", "sydney"]),
+    ("IN", "印度", ["印度", "孟买", "india", "mumbai"]),
+    ("RU", "俄罗斯", ["俄罗斯", "莫斯科", "russia", "moscow"]),
+    ("TR", "土耳其", ["土耳其", "turkey", "istanbul"]),
+    ("MY", "马来西亚", ["马来西亚", "malaysia"]),
+    ("TH", "泰国", ["泰国", "thailand", "bangkok"]),
+    ("VN", "越南", ["越南", "vietnam"]),
+    ("PH", "菲律宾", ["菲律宾", "philippines"]),
+    ("AR", "阿根廷", ["阿根廷", "argentina"]),
+    ("BR", "巴西", ["巴西", "brazil"]),
+]
+
+REGION_NAMES = {code: name for code, name, _ in REGIONS}
+REGION_NAMES["OTHER"] = "其他"
+
+# 常见的非标准写法
+_CODE_ALIASES = {"UK": "GB"}
+
+# 关键词 → 每个地区一个命名分组，match.lastgroup 即地区代码
+_KEYWORD_RE = re.compile(
+    "|".join(
+        f"(?P<{code}>{'|'.join(re.escape(k) for k in keywords)})"
+        for code, _, keywords in REGIONS
+    ),
+    re.IGNORECASE,
+)
+
+# 国旗 emoji：两个区域指示符
+_FLAG_RE = re.compile("[\U0001F1E6-\U0001F1FF]{2}")
+
+# 独立出现的大写国家代码，如 "HK-01"、"US 02"
+_CODE_RE = re.compile(
+    r"(?<![A-Za-z])("
+    + "|".join(list(REGION_NAMES)[:-1] + list(_CODE_ALIASES))
+    + r")(?![A-Za-z])"
+)
+
+
+def _flag_to_code(flag):
+    return "".join(chr(ord(c) - 0x1F1E6 + ord("A")) for c in flag)
+
+
+@functools.lru_cache(maxsize=65536)
+def classify_region(name):
+    """
+    识别节点所属地区
+
+    Returns:
+        str: 地区代码（如 "HK"），无法识别时为 "OTHER"
+    """
+    if not name:
+        return "OTHER"
+
+    match = _KEYWORD_RE.search(name)
+    if match:
+        return match.lastgroup
+
+    match = _FLAG_RE.search(name)
+    if match:
+        code = _flag_to_code(match.group())
+        # 部分机场用 🇨🇳 标注台湾节点，关键词未命中时无法区分，归入其他
+        if code in REGION_NAMES and code != "OTHER":
+            return code
+
+    match = _CODE_RE.search(name)
+    if match:
+        code = match.group(1)
+        return _CODE_ALIASES.get(code, code)
+
+    return "OTHER"
+
+
+def _flag(code):
+    return "".join(chr(0x1F1E6 + ord(c) - ord("A")) for c in code)
+
+
+def region_filter(code):
+    """
+    地区匹配的 RE2 正则（供 Clash 代理组的 filter / exclude-filter 使用）
+    RE2 不支持环视，国家代码用非字母边界近似；OTHER 返回所有地区的并集，应作为 exclude-filter
+    """
+    if code == "OTHER":
+        return "|".join(region_filter(c) for c, _, _ in REGIONS)
+
+    keywords = next(k for c, _, k in REGIONS if c == code)
+    codes = [code] + [alias for alias, target in _CODE_ALIASES.items() if target == code]
+    return (
+        "(?i:" + "|".join(re.escape(k) for k in keywords) + ")"
+        + "|" + _flag(code)
+        + "|(?:^|[^A-Za-z])(?:" + "|".join(codes) + ")(?:[^A-Za-z]|$)"
+    )
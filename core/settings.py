@@ -0,0 +1,169 @@
+"""
+启动器配置模块
+默认配置 + launcher_config.yaml 覆盖（缺省字段保留默认值）
+"""
+
+import copy
+import os
+import threading
+
+SETTINGS_PATH = "launcher_config.yaml"
+
+DEFAULT_SETTINGS = {
+    # Clash 进程守护
+    "supervisor": {
+        "log_buffer_kb": 256,        # 内存中保留的核心输出大小
+        "restart_backoff": 1.0,      # 首次重启等待（秒）
+        "restart_backoff_max": 30.0, # 重启等待上限（秒）
+        "stable_uptime": 60.0,       # 运行超过该时长视为稳定，重置退避
+        "ready_timeout": 15.0,       # 等待控制器就绪的最长时间（秒）
+    },
+    # 系统代理
+    "proxy": {
+        "mode": "system",            # system: 全局代理 + 绕过列表; pac: 自动配置脚本
+        "pac_url": None,             # 为空时由 server.host / server.port 推出
+        # auto: Windows 写注册表，其他平台不修改系统设置; registry / env（写 config/proxy.env）/ none
+        "backend": "auto",
+    },
+    # 控制面板 API 服务
+    "server": {
+        "headless": False,           # 无托盘、不打开浏览器，作为共享网关运行（也可用 --headless 启动）
+        "host": "127.0.0.1",         # 网关模式下改为 0.0.0.0 供局域网访问
+        "port": 8080,
+        "workers": 8,                # 处理阻塞请求（更新订阅、测速等）的工作线程数
+    },
+    # 订阅合并
+    "merge": {
+        "test_url": "http://www.gstatic.com/generate_204",
+        "regions": [],               # 生成地区组的地区代码，为空表示全部出现的地区
+        "region_min_nodes": 1,       # 节点数少于该值的地区不单独成组
+        "region_interval": 600,      # 地区组测速间隔（秒，auto_regions/ai_regions 之外的地区组仅在使用时测速）
+        "ai_regions": [],            # 非空时 AI 域名固定走这些地区，如 ["US", "JP"]
+        # 「自动选择」与各 AI 服务自动组比较的地区，这些地区组常驻测速，其余地区组仅在使用时测速；
+        # 为空表示全部地区（测速量随整个订阅增长）
+        "auto_regions": ["HK", "TW", "JP", "SG", "US"],
+        "provider_mode": False,      # 节点写入单独的 provider 文件，更新节点时无需重启 Clash
+        "ai_services": True,         # 为 OpenAI / Gemini / Claude / 其他 AI 分别生成可单独切换的组
+        "load_balance": False,       # 生成负载均衡组：把连接分摊到评分最好的 lb_size 个节点
+        "lb_size": 8,
+        "lb_strategy": "round-robin",  # round-robin 逐个连接轮换；sticky-sessions 同一来源+目标一段时间内走同一节点
+        "lb_domains": [              # 走负载均衡组的域名（后缀匹配），用于批量 API 调用
+            "api.openai.com",
+            "api.anthropic.com",
+            "generativelanguage.googleapis.com",
+        ],
+    },
+    # 分层测速
+    "health": {
+        "enabled": True,
+        "hot_size": 20,              # 热门层节点数
+        "hot_interval": 60,          # 热门层测速间隔（秒）
+        "cold_shard_size": 40,       # 冷门层每次测速的分片大小
+        "cold_interval": 120,        # 冷门层分片轮转间隔（秒）
+        "timeout_ms": 3000,
+        "concurrency": 8,
+        "test_url": "http://www.gstatic.com/generate_204",
+    },
+    # GeoIP / GeoSite 数据库缓存
+    "geodata": {
+        "enabled": True,
+        "refresh_interval": 604800,  # 后台检查更新的间隔（秒）
+        # 文件名 → 下载地址（同目录下需有 <地址>.sha256sum 校验文件）
+        "files": {
+            "Country.mmdb": "https://github.com/MetaCubeX/meta-rules-dat/releases/download/latest/country.mmdb",
+            "GeoSite.dat": "https://github.com/MetaCubeX/meta-rules-dat/releases/download/latest/geosite.dat",
+        },
+    },
+    # 订阅下载
+    "fetch": {
+        "max_size_mb": 32,           # 解压后的订阅体积上限
+        "chunk_kb": 64,              # 流式读取的块大小
+        "timeout": 15,               # 连接/读取超时（秒）
+    },
+    # AI 域名 DNS 预热：核心就绪后并发解析，首个请求不再等待 DoH 冷查询
+    "dns_warmup": {
+        "enabled": True,
+        "domains": [
+            "chatgpt.com", "api.openai.com", "cdn.oaistatic.com",
+            "claude.ai", "api.anthropic.com",
+            "gemini.google.com", "generativelanguage.googleapis.com", "www.gstatic.com",
+            "grok.com",
+        ],
+        "concurrency": 8,
+        "timeout": 5,
+    },
+    # 切换节点后经专用预热组与本机入口预热 AI 服务连接，并记录各主机经该节点的首字节时间
+    "prewarm": {
+        "enabled": False,
+        "hosts": ["chatgpt.com", "api.openai.com", "claude.ai", "api.anthropic.com", "gemini.google.com"],
+        "timeout": 5,
+        "concurrency": 8,
+        "port": 7899,                # 预热入口端口（本机监听，经「预热」组出站）
+    },
+    # 带宽测速：经专用测速组与本机入口下载测速文件，记录吞吐量与首字节时间
+    "speedtest": {
+        # 开启后配置中会多出 slots 个测速组（每组一份完整节点列表）与本机测速入口，默认关闭
+        "enabled": False,
+        "url": "https://speed.cloudflare.com/__down?bytes=25000000",  # 可换成局域网内的文件地址
+        "slots": 2,                  # 测速组数量，即同时测速的节点数
+        "base_port": 7900,           # 测速入口起始端口（本机监听）
+        "max_mb": 10,                # 每个节点最多下载的数据量
+        "duration": 8,               # 每个节点最长下载时间（秒）
+        "timeout": 10,               # 连接/首字节超时（秒）
+    },
+    # 持久化状态：已选节点、代理开关、节点统计与配置哈希，重启后核心就绪即恢复
+    "state": {
+        "enabled": True,
+        "path": "config/state.db",
+        "autosave_interval": 60,     # 节点统计的保存间隔（秒），退出时另存一次
+    },
+    # 订阅更新
+    "update": {
+        "blue_green": False,         # 在备用端口启动新核心，就绪后无缝切换
+        "auto": True,                # 后台定时更新上次使用的订阅
+        "interval": 21600,           # 定时更新间隔（秒）
+        "jitter": 600,               # 在间隔上随机增加 0~jitter 秒，避免整点集中请求
+        "retry_interval": 900,       # 更新失败后的重试间隔（秒）
+    },
+}
+
+_settings = None
+_settings_lock = threading.Lock()
+
+
+def _deep_merge(base, override):
+    """递归合并配置字典"""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def load_settings(path=SETTINGS_PATH):
+    """加载配置文件"""
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+
+    if os.path.exists(path):
+        try:
+            import yaml
+
+            with open(path, "r", encoding="utf-8") as f:
+                user_settings = yaml.safe_load(f)
+            if isinstance(user_settings, dict):
+                _deep_merge(settings, user_settings)
+        except Exception as e:
+            print(f"[Settings] ⚠️ 加载配置文件失败，使用默认配置: {e}")
+
+    return settings
+
+
+def get_settings(section=None):
+    """获取全局配置（可指定分组）"""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = load_settings()
+    return _settings[section] if section else _settings
@@ -0,0 +1,188 @@
+"""
+带宽测速
+延迟探测看不出节点能否撑住大流量的流式响应。测速时把待测节点钉在专用的「测速-i」组上，
+经该组独占的本机入口下载测速文件（数据量与时长都有上限），记录吞吐量与首字节时间；
+测速组数量即并发上限，正常流量不受影响。测速地址可替换，便于用局域网或本机的 HTTP 服务代替
+"""
+
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from core.clash_api import get_controller
+from core.node_stats import get_node_stats
+from core.settings import get_settings
+from core.yaml_merge import speedtest_slot_names
+
+CHUNK_SIZE = 64 * 1024
+# 测速地址只允许 http/https：urllib 还能打开 file:// 与 ftp://，接口传入的地址不能借此读本机文件
+URL_SCHEMES = ("http", "https")
+
+
+def check_url(url):
+    """测速地址不是 http/https 时抛出 ValueError"""
+    parsed = urlparse(url or "")
+    if parsed.scheme.lower() not in URL_SCHEMES or not parsed.netloc:
+        raise ValueError(f"测速地址只支持 http/https: {url}")
+    return url
+
+
+class SpeedTester:
+    """经测速组逐个节点下载测速"""
+
+    def __init__(self, stats=None):
+        cfg = get_settings("speedtest")
+        self.stats = stats or get_node_stats()
+        self.enabled = cfg["enabled"]
+        self.url = cfg["url"]
+        self.groups = speedtest_slot_names(cfg["slots"])
+        self.max_bytes = int(cfg["max_mb"] * 1024 * 1024)
+        self.duration = cfg["duration"]
+        self.timeout = cfg["timeout"]
+        self.last = None
+        self.progress = None
+        self._lock = threading.Lock()
+        self._progress_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def measure(self, port, url):
+        """
+        经本机 port 入口下载 url，达到数据量或时长上限即停止
+
+        Returns:
+            dict: kbps / ttfb_ms / bytes / error
+        """
+        proxy = f"http://127.0.0.1:{port}"
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({"http": proxy, "https": proxy}))
+        result = {"kbps": None, "ttfb_ms": None, "bytes": 0, "error": None}
+        try:
+            check_url(url)
+        except ValueError as e:
+            result["error"] = str(e)
+            return result
+        started = time.perf_counter()
+        try:
+            with opener.open(url, timeout=self.timeout) as response:
+                chunk = response.read1(CHUNK_SIZE)
+                first_byte = time.perf_counter()
+                result["ttfb_ms"] = round((first_byte - started) * 1000)
+                received = len(chunk)
+                while chunk and received < self.max_bytes and time.perf_counter() - first_byte < self.duration:
+                    chunk = response.read1(CHUNK_SIZE)
+                    received += len(chunk)
+            # 吞吐量从首字节开始计算，不含握手与排队时间
+            elapsed = max(time.perf_counter() - first_byte, 1e-3)
+            result["bytes"] = received
+            result["kbps"] = round(received * 8 / 1000 / elapsed)
+        except Exception as e:
+            result["error"] = str(e) or e.__class__.__name__
+        return result
+
+    def _test(self, slots, node, url):
+        group, port = slots.get()
+        try:
+            pinned = get_controller().select_proxy(group, node)
+        except Exception:
+            pinned = False
+        try:
+            if pinned:
+                result = self.measure(port, url)
+            else:
+                result = {"kbps": None, "ttfb_ms": None, "bytes": 0, "error": f"无法切换 {group}"}
+        finally:
+            slots.put((group, port))
+        self.stats.record_speed(node, result["kbps"], result["ttfb_ms"], result["bytes"])
+        with self._progress_lock:
+            self.progress["done"] += 1
+        return node, result
+
+    def run(self, names, base_port, url=None):
+        """
+        测速一批节点（同时测速的节点数不超过测速组数量）
+
+        Args:
+            names: 待测节点名
+            base_port: 活动核心上第一个测速入口的端口
+            url: 测速地址，为空时使用配置
+
+        Returns:
+            dict: 每个节点的结果
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("已有测速正在进行")
+        try:
+            return self._run(names, base_port, url)
+        finally:
+            self._lock.release()
+
+    def _run(self, names, base_port, url):
+        """测速主体，调用方已持有 _lock"""
+        url = check_url(url or self.url)
+        slots = queue.Queue()
+        for i, group in enumerate(self.groups):
+            slots.put((group, base_port + i))
+
+        names = list(dict.fromkeys(names))
+        self.progress = {"done": 0, "total": len(names)}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.groups)) as pool:
+            results = dict(pool.map(lambda name: self._test(slots, name, url), names))
+        total_ms = round((time.perf_counter() - started) * 1000)
+
+        ok = [name for name, r in results.items() if r["kbps"]]
+        best = max(ok, key=lambda name: results[name]["kbps"], default=None)
+        print(
+            f"[SpeedTest] {len(ok)}/{len(results)} 个节点完成，耗时 {total_ms}ms"
+            + (f"（最快 {best} {results[best]['kbps']}kbps）" if best else "")
+        )
+        self.last = {"time": time.time(), "url": url, "total_ms": total_ms, "nodes": results}
+        return self.last
+
+    def run_async(self, names, base_port, url=None):
+        """后台测速；已有测速在进行时返回 False"""
+        # 先在调用线程里占住锁，两个几乎同时的请求不会都启动测速
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            threading.Thread(
+                target=self._run_logged, args=(names, base_port, url), name="speedtest", daemon=True
+            ).start()
+        except Exception:
+            self._lock.release()
+            raise
+        return True
+
+    def _run_logged(self, names, base_port, url):
+        try:
+            self._run(names, base_port, url)
+        except Exception as e:
+            print(f"[SpeedTest] ⚠️ 测速失败: {e}")
+        finally:
+            self._lock.release()
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "url": self.url,
+            "running": self.running,
+            "progress": self.progress,
+            "last": self.last,
+        }
+
+
+# 全局实例
+_tester = None
+
+
+def get_speed_tester():
+    """获取全局测速器"""
+    global _tester
+    if _tester is None:
+        _tester = SpeedTester()
+    return _tester
@@ -0,0 +1,76 @@
+"""
+启动流水线
+把启动步骤描述为依赖图：没有依赖关系的步骤并发执行，
+每个步骤在其依赖全部成功后立即开始，并记录各自耗时
+"""
+
+import threading
+import time
+
+from core.startup_timeline import mark
+
+
+class StartupPipeline:
+    """按依赖关系并发执行的启动步骤集合"""
+
+    def __init__(self):
+        self._steps = {}
+        self._done = {}
+        self.results = {}
+        self.durations = {}
+
+    def add(self, name, func, deps=()):
+        """
+        添加步骤
+
+        Args:
+            name: 步骤名
+            func: 无参函数；返回 False 或抛出异常视为失败，依赖它的步骤将被跳过
+            deps: 依赖的步骤名
+        """
+        for dep in deps:
+            if dep not in self._steps:
+                raise ValueError(f"步骤 {name} 依赖未知步骤 {dep}")
+        self._steps[name] = (func, tuple(deps))
+        self._done[name] = threading.Event()
+        return self
+
+    def _run_step(self, name):
+        func, deps = self._steps[name]
+        try:
+            for dep in deps:
+                self._done[dep].wait()
+                if self.results.get(dep) is False:
+                    print(f"[Pipeline] ⏭️ {name} 已跳过（依赖 {dep} 失败）")
+                    self.results[name] = False
+                    return
+
+            started = time.perf_counter()
+            try:
+                result = func()
+            except Exception as e:
+                print(f"[Pipeline] ❌ {name} 失败: {e}")
+                result = False
+
+            self.results[name] = result is not False
+            self.durations[name] = round((time.perf_counter() - started) * 1000, 1)
+            print(f"[Pipeline] {name}: {self.durations[name]}ms")
+            if self.results[name]:
+                mark(name)
+        finally:
+            self._done[name].set()
+
+    def start(self):
+        """在后台线程中启动所有步骤，立即返回"""
+        for name in self._steps:
+            threading.Thread(target=self._run_step, args=(name,), name=f"startup-{name}", daemon=True).start()
+        return self
+
+    def wait(self, timeout=None):
+        """等待所有步骤结束"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self._done.values():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not event.wait(remaining):
+                return False
+        return True
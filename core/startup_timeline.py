@@ -0,0 +1,29 @@
+"""
+启动时间线
+记录从进程启动到托盘出现、API 可访问、Clash 就绪等关键节点的耗时
+"""
+
+import threading
+import time
+
+# 本模块应尽早被导入（main.py 第一批导入），以此作为时间零点
+_T0 = time.perf_counter()
+_marks = {}
+_lock = threading.Lock()
+
+
+def mark(name):
+    """记录一个启动节点（同名节点只记录第一次）"""
+    elapsed_ms = round((time.perf_counter() - _T0) * 1000, 1)
+    with _lock:
+        if name in _marks:
+            return _marks[name]
+        _marks[name] = elapsed_ms
+    print(f"[Startup] {name}: {elapsed_ms}ms")
+    return elapsed_ms
+
+
+def get_timeline():
+    """返回已记录的启动节点（毫秒，按时间排序）"""
+    with _lock:
+        return dict(sorted(_marks.items(), key=lambda item: item[1]))
@@ -0,0 +1,189 @@
+"""
+持久化状态
+已选节点、系统代理开关、节点统计与最近一次配置的哈希保存在本地 SQLite 中（WAL 模式），
+重启后核心一就绪即可恢复上次的节点与代理状态，分层测速也直接从已有的评分开始，不必等全部节点重新测一遍
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from core.settings import get_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS node_stats (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def file_sha256(path):
+    """文件内容的 sha256，文件不存在时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class StateStore:
+    """键值状态与节点统计的本地存储"""
+
+    def __init__(self, path=None):
+        cfg = get_settings("state")
+        self.enabled = cfg["enabled"]
+        self.path = path or cfg["path"]
+        self.autosave_interval = cfg["autosave_interval"]
+        self._db = None
+        self._lock = threading.Lock()
+        self._saved_version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    # ---------- 键值 ----------
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        with self._lock:
+            row = self.db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+
+    def update(self, key, mapping):
+        """合并写入字典类型的值（如各组的已选节点）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            row = self.db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            value = json.loads(row[0]) if row else {}
+            value.update(mapping)
+            self.db.execute(
+                "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+
+    # ---------- 节点统计 ----------
+    def save_node_stats(self, stats):
+        """
+        把节点统计的变化写入数据库：只更新变化过的节点、删除已清理的节点
+        （统计自上次保存后没有变化时跳过）
+
+        Returns:
+            int: 写入与删除的节点数
+        """
+        if not self.enabled or stats.version == self._saved_version:
+            return 0
+        version = stats.version
+        changed, removed = stats.pop_changes()
+        now = time.time()
+        with self._lock:
+            db = self.db
+            db.execute("BEGIN")
+            try:
+                db.executemany("DELETE FROM node_stats WHERE name = ?", ((name,) for name in removed))
+                db.executemany(
+                    "INSERT OR REPLACE INTO node_stats (name, data, updated_at) VALUES (?, ?, ?)",
+                    ((name, json.dumps(entry, ensure_ascii=False), now) for name, entry in changed.items()),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                stats.requeue(changed, removed)
+                raise
+        self._saved_version = version
+        return len(changed) + len(removed)
+
+    def load_node_stats(self, stats):
+        """
+        把保存的节点统计载入内存
+
+        Returns:
+            int: 载入的节点数
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            rows = self.db.execute("SELECT name, data FROM node_stats").fetchall()
+        stats.restore({name: json.loads(data) for name, data in rows})
+        self._saved_version = stats.version
+        if rows:
+            print(f"[State] 已恢复 {len(rows)} 个节点的统计")
+        return len(rows)
+
+    # ---------- 自动保存 ----------
+    def start_autosave(self, stats):
+        if not self.enabled:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(stats,), name="state-autosave", daemon=True)
+        self._thread.start()
+
+    def _loop(self, stats):
+        while not self._stop.wait(self.autosave_interval):
+            try:
+                self.save_node_stats(stats)
+            except Exception as e:
+                print(f"[State] ⚠️ 保存节点统计失败: {e}")
+
+    def close(self, stats=None):
+        """退出前保存一次节点统计"""
+        self._stop.set()
+        if stats is not None:
+            try:
+                self.save_node_stats(stats)
+            except Exception as e:
+                print(f"[State] ⚠️ 保存节点统计失败: {e}")
+
+    def status(self):
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "path": self.path,
+            "proxy_enabled": self.get("proxy_enabled", False),
+            "selected": self.get("selected", {}),
+            "config_hash": self.get("config_hash"),
+        }
+
+
+# 全局实例
+_store = None
+
+
+def get_state_store():
+    """获取全局状态存储"""
+    global _store
+    if _store is None:
+        _store = StateStore()
+    return _store
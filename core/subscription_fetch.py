@@ -0,0 +1,222 @@
+"""
+订阅下载模块
+- 带 ETag / Last-Modified 的条件请求：订阅未变化时服务器返回 304，直接使用本地缓存的内容，
+  省去重复下载；缓存保存在 config/cache 下，重启启动器后依然有效
+- 流式下载（协商 gzip/deflate，限制最大体积），边下载边写缓存、边解码 Base64、边按行清理 YAML 标签，
+  内存中只保留最终的订阅文本
+"""
+
+import base64
+import codecs
+import hashlib
+import json
+import os
+import re
+import time
+
+from core.settings import get_settings
+
+CACHE_DIR = os.path.join("config", "cache")
+
+# 部分订阅带有 PyYAML 无法识别的类型标签，如 "!<str> 123"
+YAML_TAG_RE = re.compile(r'!\<[a-zA-Z]+\>\s*')
+
+# 判断订阅是否为 Base64：开头一段只包含 Base64 字符（YAML 与 URI 都会出现 ":"）
+_B64_SNIFF_BYTES = 256
+_B64_RE = re.compile(rb"[A-Za-z0-9+/=_\-\s]+")
+_B64_STRIP_RE = re.compile(rb"[^A-Za-z0-9+/_\-]")
+_B64_URLSAFE = bytes.maketrans(b"-_", b"+/")
+
+
+class SubscriptionDecoder:
+    """把订阅原始字节逐块还原为文本：识别并增量解码 Base64，按行清理 YAML 标签"""
+
+    def __init__(self):
+        self.base64 = None          # None 表示尚未判定
+        self._head = b""
+        self._b64_rest = b""
+        self._utf8 = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._line_rest = ""
+        self._parts = []
+
+    def feed(self, chunk):
+        if self.base64 is None:
+            self._head += chunk
+            if len(self._head.lstrip()) < _B64_SNIFF_BYTES:
+                return
+            chunk = self._sniff()
+        self._feed_bytes(chunk)
+
+    def finish(self):
+        """结束输入，返回完整文本"""
+        if self.base64 is None:
+            self._feed_bytes(self._sniff())
+        if self.base64:
+            self._feed_text(self._decode_b64(b"", final=True))
+        self._line_rest += self._utf8.decode(b"", final=True)
+        self._parts.append(YAML_TAG_RE.sub("", self._line_rest))
+        self._line_rest = ""
+        text = "".join(self._parts)
+        self._parts = []
+        return text
+
+    def _sniff(self):
+        head, self._head = self._head, b""
+        sample = head.lstrip()[:_B64_SNIFF_BYTES]
+        self.base64 = bool(sample) and _B64_RE.fullmatch(sample) is not None
+        return head
+
+    def _feed_bytes(self, chunk):
+        if self.base64:
+            chunk = self._decode_b64(chunk)
+        self._feed_text(chunk)
+
+    def _decode_b64(self, chunk, final=False):
+        data = self._b64_rest + _B64_STRIP_RE.sub(b"", chunk).translate(_B64_URLSAFE)
+        if final:
+            # 剩余 1 个字符无法构成任何字节，直接丢弃
+            self._b64_rest = b""
+            if len(data) % 4 == 1:
+                data = data[:-1]
+            return base64.b64decode(data + b"=" * (-len(data) % 4))
+        usable = len(data) - len(data) % 4
+        self._b64_rest = data[usable:]
+        return base64.b64decode(data[:usable])
+
+    def _feed_text(self, data):
+        if not data:
+            return
+        text = self._line_rest + self._utf8.decode(data)
+        # 只清理完整的行，避免标签被块边界截断
+        cut = text.rfind("\n") + 1
+        self._line_rest = text[cut:]
+        if cut:
+            self._parts.append(YAML_TAG_RE.sub("", text[:cut]))
+
+
+def _cache_paths(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return (
+        os.path.join(CACHE_DIR, f"{key}.json"),
+        os.path.join(CACHE_DIR, f"{key}.body"),
+    )
+
+
+def _load_meta(url):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("url") != url or not os.path.exists(body_path):
+        return None
+    return meta
+
+
+def _save_meta(meta_path, meta):
+    tmp = f"{meta_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, meta_path)
+
+
+def iter_limited(response, chunk_size, max_mb):
+    """
+    流式读取响应体，超过 max_mb 时抛出 ValueError
+    iter_content 返回解压后的数据，按解压后的体积限制（防止压缩炸弹）
+    """
+    max_bytes = max_mb * 1024 * 1024
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        raise ValueError(f"订阅内容超过 {max_mb}MB 上限")
+    size = 0
+    for chunk in response.iter_content(chunk_size):
+        size += len(chunk)
+        if size > max_bytes:
+            raise ValueError(f"订阅内容超过 {max_mb}MB 上限")
+        yield chunk
+
+
+def _read_cached(body_path, decoder, chunk_size):
+    with open(body_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            decoder.feed(chunk)
+    return decoder.finish()
+
+
+def fetch_subscription(url, timeout=None):
+    """
+    下载订阅内容（clashn:// 为每日免费节点源）
+
+    Returns:
+        (str, bool): 订阅文本（Base64 订阅已解码），以及内容相对上次缓存是否有变化
+    """
+    if url.startswith("clashn://"):
+        from core.clashn_format import fetch_clashn
+
+        return fetch_clashn(url)
+
+    import requests
+
+    cfg = get_settings("fetch")
+    chunk_size = cfg["chunk_kb"] * 1024
+    timeout = timeout or cfg["timeout"]
+
+    meta = _load_meta(url)
+    meta_path, body_path = _cache_paths(url)
+    headers = {"Accept-Encoding": "gzip, deflate"}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    decoder = SubscriptionDecoder()
+    with requests.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304 and meta:
+            print(f"[Fetch] 订阅未变化 (304): {url}")
+            return _read_cached(body_path, decoder, chunk_size), False
+
+        response.raise_for_status()
+
+        # 服务器不支持条件请求时不写缓存
+        new_meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        cache_file = None
+        if new_meta["etag"] or new_meta["last_modified"]:
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                cache_file = open(f"{body_path}.tmp", "wb")
+            except OSError as e:
+                print(f"[Fetch] ⚠️ 写入订阅缓存失败: {e}")
+
+        digest = hashlib.sha1()
+        try:
+            for chunk in iter_limited(response, chunk_size, cfg["max_size_mb"]):
+                digest.update(chunk)
+                decoder.feed(chunk)
+                if cache_file:
+                    cache_file.write(chunk)
+        except Exception:
+            if cache_file:
+                cache_file.close()
+                os.remove(cache_file.name)
+            raise
+        if cache_file:
+            cache_file.close()
+
+    new_meta["sha1"] = digest.hexdigest()
+    if cache_file:
+        try:
+            os.replace(cache_file.name, body_path)
+            _save_meta(meta_path, new_meta)
+        except OSError as e:
+            print(f"[Fetch] ⚠️ 写入订阅缓存失败: {e}")
+
+    changed = not meta or meta.get("sha1") != new_meta["sha1"]
+    return decoder.finish(), changed
@@ -1,31 +1,162 @@
+"""
+订阅定时更新模块
+后台线程按「间隔 + 随机抖动」定时更新上次使用的订阅，运行状态保存在 config/update_state.json，
+重启启动器后按上次的时间继续计时；实际更新由调用方传入的函数完成（与手动更新走同一流程）
+"""
+
+import json
 import os
-from core.net_time import get_network_datetime
-from core.generate_config import generate_config  # 正确引用 generate_config.py
+import random
+import threading
+import time
+
+from core.settings import get_settings
+
+STATE_PATH = os.path.join("config", "update_state.json")
+
+# 启动后至少等待这么久才执行积压的更新，避免与 Clash 启动争抢
+STARTUP_DELAY = 60
+
+
+class UpdateScheduler:
+    """订阅定时更新器"""
+
+    def __init__(self, update_func=None, state_path=STATE_PATH):
+        cfg = get_settings("update")
+        self.update_func = update_func
+        self.state_path = state_path
+        self.enabled = cfg["auto"]
+        self.interval = cfg["interval"]
+        self.jitter = cfg["jitter"]
+        self.retry_interval = cfg["retry_interval"]
+
+        self.state = self._load_state()
+        self.running = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- 状态持久化 ----------
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if isinstance(state, dict):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_state(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"[Update] ⚠️ 保存更新状态失败: {e}")
+
+    def _schedule(self, delay):
+        self.state["next_run"] = time.time() + delay + random.uniform(0, self.jitter)
+
+    # ---------- 对外接口 ----------
+    def remember_url(self, url):
+        """记录手动更新成功的订阅，并从现在开始重新计时"""
+        with self._lock:
+            self.state["url"] = url
+            self.state["last_run"] = self.state["last_success"] = time.time()
+            self.state["last_status"] = "manual"
+            self._schedule(self.interval)
+            self._save_state()
+        self._wakeup.set()
+
+    def run_once(self):
+        """立即执行一次更新"""
+        url = self.state.get("url")
+        if not url or self.update_func is None:
+            return None
 
+        self.running = True
+        print(f"[Update] 正在定时更新订阅: {url}")
+        try:
+            result = self.update_func(url)
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+        finally:
+            self.running = False
 
-UPDATE_FLAG = os.path.join("config", "last_update.txt")
+        with self._lock:
+            now = time.time()
+            self.state["last_run"] = now
+            self.state["last_status"] = result.get("status")
+            self.state["last_message"] = result.get("message")
+            if result.get("status") == "success":
+                self.state["last_success"] = now
+                self._schedule(self.interval)
+            else:
+                print(f"[Update] ⚠️ 定时更新失败: {result.get('message')}")
+                self._schedule(min(self.retry_interval, self.interval))
+            self._save_state()
+        return result
 
+    def status(self):
+        with self._lock:
+            state = dict(self.state)
+        state.update({
+            "enabled": self.enabled,
+            "running": self.running,
+            "interval": self.interval,
+            "jitter": self.jitter,
+        })
+        return state
 
-def need_update():
-    now = get_network_datetime().strftime("%Y%m%d")
+    # ---------- 后台线程 ----------
+    def start(self):
+        if not self.enabled:
+            print("[Update] 定时更新已禁用")
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="update-scheduler", daemon=True)
+        self._thread.start()
 
-    if not os.path.exists(UPDATE_FLAG):
-        return True
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
 
-    with open(UPDATE_FLAG, "r", encoding="utf-8") as f:
-        last = f.read().strip()
+    def _loop(self):
+        earliest = time.time() + STARTUP_DELAY
+        while not self._stop.is_set():
+            with self._lock:
+                if not self.state.get("url"):
+                    delay = None
+                else:
+                    if "next_run" not in self.state:
+                        last = self.state.get("last_run") or 0
+                        self.state["next_run"] = last + self.interval
+                    delay = max(self.state["next_run"], earliest) - time.time()
 
-    return last != now
+            if delay is None or delay > 0:
+                # 没有订阅时一直等到手动更新记录了订阅
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
 
+            self.run_once()
 
-def update_if_needed():
-    if not need_update():
-        return False
 
-    generate_config()
+# 全局实例
+_scheduler = None
 
-    os.makedirs("config", exist_ok=True)
-    with open(UPDATE_FLAG, "w", encoding="utf-8") as f:
-        f.write(get_network_datetime().strftime("%Y%m%d"))
 
-    return True
+def get_update_scheduler(update_func=None):
+    """获取全局定时更新器（首次传入的 update_func 负责实际更新）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UpdateScheduler(update_func)
+    elif update_func is not None:
+        _scheduler.update_func = update_func
+    return _scheduler
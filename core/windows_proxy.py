@@ -1,72 +1,222 @@
 """
 Windows 系统代理管理模块（增强版）
 解决中国大陆环境下的代理问题
+非 Windows 平台与无界面网关模式下可换用环境变量文件或空后端（proxy.backend）
 """
 
-import winreg
-import ctypes
+import os
 import time
 
-class WindowsProxyManager:
-    """Windows 系统代理管理器"""
-    
+
+# =====================================================
+# 系统代理后端
+# =====================================================
+class ProxyBackend:
+    """系统代理设置的读写接口（值名沿用 Internet Settings 注册表）"""
+
+    def read(self, name, default=None):
+        raise NotImplementedError
+
+    def write_many(self, values):
+        """批量写入 {值名: 值}，值为 None 表示删除该项；成功返回 True"""
+        raise NotImplementedError
+
+    def notify(self):
+        """通知系统设置已更改"""
+        return True
+
+
+class WinRegistryBackend(ProxyBackend):
+    """Windows 注册表 + WinINet 通知"""
+
     INTERNET_SETTINGS = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
-    
+    DWORD_VALUES = {"ProxyEnable"}
+
     def __init__(self):
-        self.original_proxy_enable = None
-        self.original_proxy_server = None
-        self.original_proxy_override = None
-        
-    def _read_registry_value(self, key_path, value_name, default=None):
+        import winreg
+
+        self._winreg = winreg
+
+    def read(self, name, default=None):
         """读取注册表值"""
+        winreg = self._winreg
         try:
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_READ) as key:
-                value, _ = winreg.QueryValueEx(key, value_name)
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.INTERNET_SETTINGS, 0, winreg.KEY_READ) as key:
+                value, _ = winreg.QueryValueEx(key, name)
                 return value
-        except (WindowsError, FileNotFoundError):
+        except OSError:
             return default
-    
-    def _write_registry_value(self, key_path, value_name, value, value_type=winreg.REG_SZ):
-        """写入注册表值"""
+
+    def write_many(self, values):
+        """一次打开注册表键写入全部值"""
+        winreg = self._winreg
         try:
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_WRITE) as key:
-                winreg.SetValueEx(key, value_name, 0, value_type, value)
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.INTERNET_SETTINGS, 0, winreg.KEY_WRITE) as key:
+                for name, value in values.items():
+                    if value is None:
+                        try:
+                            winreg.DeleteValue(key, name)
+                        except FileNotFoundError:
+                            pass
+                        continue
+                    value_type = winreg.REG_DWORD if name in self.DWORD_VALUES else winreg.REG_SZ
+                    winreg.SetValueEx(key, name, 0, value_type, value)
             return True
         except Exception as e:
             print(f"[Proxy] 写入注册表失败: {e}")
             return False
-    
-    def _notify_system(self):
-        """通知系统代理设置已更改"""
+
+    def notify(self):
+        """通知系统代理设置已更改（一次即可）"""
         try:
+            import ctypes
+
             INTERNET_OPTION_SETTINGS_CHANGED = 39
             INTERNET_OPTION_REFRESH = 37
-            
+
             internet_set_option = ctypes.windll.wininet.InternetSetOptionW
-            
-            # 多次通知确保生效
-            for _ in range(3):
-                internet_set_option(0, INTERNET_OPTION_SETTINGS_CHANGED, 0, 0)
-                internet_set_option(0, INTERNET_OPTION_REFRESH, 0, 0)
-                time.sleep(0.1)
-            
+            internet_set_option(0, INTERNET_OPTION_SETTINGS_CHANGED, 0, 0)
+            internet_set_option(0, INTERNET_OPTION_REFRESH, 0, 0)
             return True
         except Exception as e:
             print(f"[Proxy] 通知系统失败: {e}")
             return False
+
+
+class MemoryProxyBackend(ProxyBackend):
+    """内存后端：用于非 Windows 平台的测试与基准"""
+
+    def __init__(self, initial=None):
+        self.values = dict(initial or {})
+        self.writes = 0
+        self.notifications = 0
+
+    def read(self, name, default=None):
+        return self.values.get(name, default)
+
+    def write_many(self, values):
+        for name, value in values.items():
+            if value is None:
+                self.values.pop(name, None)
+            else:
+                self.values[name] = value
+        self.writes += len(values)
+        return True
+
+    def notify(self):
+        self.notifications += 1
+        return True
+
+
+def _no_proxy_entries(bypass_list):
+    """把注册表格式的绕过列表转换为 no_proxy：*.cn → .cn；no_proxy 不支持的 IP 通配符改为本机地址"""
+    entries = ["127.0.0.1"]
+    for item in bypass_list.split(";"):
+        if item.startswith("*."):
+            entries.append(item[1:])
+        elif item and "*" not in item:
+            entries.append(item)
+    return list(dict.fromkeys(entries))
+
+
+class EnvFileProxyBackend(MemoryProxyBackend):
+    """
+    环境变量后端：代理设置变化时写出一份可 source 的 shell 文件（http_proxy / https_proxy / no_proxy），
+    供 Linux 网关或命令行工具使用。
+    只写文件、不改本进程的环境变量：启动器自己拉订阅、调控制器的请求会读取这些变量，
+    改了就会绕回自身的代理端口
+    """
+
+    def __init__(self, path=os.path.join("config", "proxy.env")):
+        super().__init__()
+        self.path = path
+
+    def _lines(self):
+        server = self.values.get("ProxyServer")
+        if not self.values.get("ProxyEnable") or not server:
+            return ["unset http_proxy https_proxy all_proxy no_proxy"]
+        url = f"http://{server}"
+        bypass = ",".join(_no_proxy_entries(self.values.get("ProxyOverride") or ""))
+        env = {"http_proxy": url, "https_proxy": url, "all_proxy": url, "no_proxy": bypass}
+        return [f"export {name}={value}" for name, value in env.items()]
+
+    def notify(self):
+        super().notify()
+        lines = self._lines()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            return True
+        except OSError as e:
+            print(f"[Proxy] 写入 {self.path} 失败: {e}")
+            return False
+
+
+PROXY_BACKENDS = {
+    "registry": WinRegistryBackend,
+    "env": EnvFileProxyBackend,
+    "none": MemoryProxyBackend,
+}
+
+
+def create_backend(name=None):
+    """
+    按 proxy.backend 创建系统代理后端；auto 表示 Windows 用注册表，其他平台不修改系统设置
+    """
+    if name is None:
+        from core.settings import get_settings
+
+        name = get_settings("proxy")["backend"]
+    if name == "auto":
+        name = "registry" if os.name == "nt" else "none"
+    if name not in PROXY_BACKENDS:
+        raise ValueError(f"未知的代理后端: {name}")
+    return PROXY_BACKENDS[name]()
+
+
+class WindowsProxyManager:
+    """Windows 系统代理管理器"""
+    
+    DEFAULT_BYPASS = "localhost;127.*;10.*;172.16.*;172.31.*;192.168.*;*.cn;*.alipay.com;*.taobao.com;*.tmall.com;*.jd.com;*.baidu.com;*.qq.com"
+    
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self.original_proxy_enable = None
+        self.original_proxy_server = None
+        self.original_proxy_override = None
+        self.original_auto_config_url = None
+        
+    def _read_registry_value(self, value_name, default=None):
+        """读取代理设置值"""
+        return self.backend.read(value_name, default)
+    
+    def _apply(self, desired):
+        """
+        只写入与当前值不同的设置，并只通知系统一次
+
+        Returns:
+            bool: 写入成功（或无需写入）
+        """
+        changes = {
+            name: value
+            for name, value in desired.items()
+            if self.backend.read(name) != value
+        }
+        if not changes:
+            return True
+        if not self.backend.write_many(changes):
+            return False
+        self.backend.notify()
+        return True
     
     def save_current_settings(self):
         """保存当前的代理设置"""
         try:
-            self.original_proxy_enable = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyEnable", 0
-            )
-            self.original_proxy_server = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyServer", ""
-            )
-            self.original_proxy_override = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyOverride", ""
-            )
+            self.original_proxy_enable = self._read_registry_value("ProxyEnable", 0)
+            self.original_proxy_server = self._read_registry_value("ProxyServer", "")
+            self.original_proxy_override = self._read_registry_value("ProxyOverride", "")
+            self.original_auto_config_url = self._read_registry_value("AutoConfigURL")
             
             print(f"[Proxy] 已保存原始代理设置:")
             print(f"  - ProxyEnable: {self.original_proxy_enable}")
@@ -77,9 +227,9 @@ class WindowsProxyManager:
             print(f"[Proxy] 保存原始设置失败: {e}")
             return False
     
-    def enable_proxy(self, proxy_server="127.0.0.1:7890", bypass_list="localhost;127.*;10.*;172.16.*;172.31.*;192.168.*;*.cn;*.alipay.com;*.taobao.com;*.tmall.com;*.jd.com;*.baidu.com;*.qq.com"):
+    def enable_proxy(self, proxy_server="127.0.0.1:7890", bypass_list=DEFAULT_BYPASS):
         """
-        启用系统代理（优化版）
+        启用系统代理（只写入有变化的值）
         
         Args:
             proxy_server: 代理服务器地址
@@ -89,71 +239,46 @@ class WindowsProxyManager:
             if self.original_proxy_enable is None:
                 self.save_current_settings()
             
-            # 🔥 关键：确保先禁用再启用，避免残留配置
-            self._write_registry_value(
-                self.INTERNET_SETTINGS,
-                "ProxyEnable",
-                0,
-                winreg.REG_DWORD
-            )
-            time.sleep(0.2)
-            
-            # 设置代理服务器
-            success = self._write_registry_value(
-                self.INTERNET_SETTINGS,
-                "ProxyServer",
-                proxy_server,
-                winreg.REG_SZ
-            )
-            
-            if not success:
-                return False
-            
-            # 设置绕过列表（国内域名直连）
-            self._write_registry_value(
-                self.INTERNET_SETTINGS,
-                "ProxyOverride",
-                bypass_list,
-                winreg.REG_SZ
-            )
-            
-            # 启用代理
-            success = self._write_registry_value(
-                self.INTERNET_SETTINGS,
-                "ProxyEnable",
-                1,
-                winreg.REG_DWORD
-            )
+            success = self._apply({
+                "ProxyServer": proxy_server,
+                # 设置绕过列表（国内域名直连）
+                "ProxyOverride": bypass_list,
+                "ProxyEnable": 1,
+                # 与 PAC 模式互斥
+                "AutoConfigURL": None,
+            })
             
-            if not success:
-                return False
-            
-            # 通知系统（多次确保生效）
-            self._notify_system()
-            
-            # 等待系统应用设置
-            time.sleep(0.5)
-            
-            # 验证设置是否生效
-            current_enable = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyEnable", 0
-            )
-            current_server = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyServer", ""
-            )
-            
-            if current_enable == 1 and current_server == proxy_server:
+            if success:
                 print(f"[Proxy] ✅ 系统代理已启用: {proxy_server}")
                 print(f"[Proxy] 绕过列表: {bypass_list[:50]}...")
-                return True
             else:
                 print(f"[Proxy] ⚠️ 代理设置可能未完全生效")
-                return False
+            return success
             
         except Exception as e:
             print(f"[Proxy] ❌ 启用代理失败: {e}")
             return False
     
+    def enable_pac(self, pac_url):
+        """
+        启用自动配置脚本（PAC）模式：直连流量不再经过本地代理
+        
+        Args:
+            pac_url: PAC 文件地址
+        """
+        try:
+            if self.original_proxy_enable is None:
+                self.save_current_settings()
+            
+            success = self._apply({"AutoConfigURL": pac_url, "ProxyEnable": 0})
+            if success:
+                print(f"[Proxy] ✅ 已启用 PAC 模式: {pac_url}")
+            return success
+            
+        except Exception as e:
+            print(f"[Proxy] ❌ 启用 PAC 模式失败: {e}")
+            return False
+    
     def disable_proxy(self):
         """禁用系统代理（恢复原始设置）"""
         try:
@@ -164,35 +289,17 @@ class WindowsProxyManager:
                 self.original_proxy_override = ""
             
             # 恢复代理启用状态
-            self._write_registry_value(
-                self.INTERNET_SETTINGS,
-                "ProxyEnable",
-                self.original_proxy_enable,
-                winreg.REG_DWORD
-            )
+            desired = {"ProxyEnable": self.original_proxy_enable}
             
-            # 恢复代理服务器
+            # 恢复代理服务器与绕过列表
             if self.original_proxy_server:
-                self._write_registry_value(
-                    self.INTERNET_SETTINGS,
-                    "ProxyServer",
-                    self.original_proxy_server,
-                    winreg.REG_SZ
-                )
-            
-            # 恢复绕过列表
+                desired["ProxyServer"] = self.original_proxy_server
             if self.original_proxy_override:
-                self._write_registry_value(
-                    self.INTERNET_SETTINGS,
-                    "ProxyOverride",
-                    self.original_proxy_override,
-                    winreg.REG_SZ
-                )
+                desired["ProxyOverride"] = self.original_proxy_override
+            desired["AutoConfigURL"] = self.original_auto_config_url
             
-            # 通知系统
-            self._notify_system()
-            
-            time.sleep(0.3)
+            if not self._apply(desired):
+                return False
             
             print("[Proxy] ✅ 系统代理已恢复到原始状态")
             return True
@@ -204,13 +311,12 @@ class WindowsProxyManager:
     def get_current_proxy(self):
         """获取当前的代理设置"""
         try:
-            proxy_enable = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyEnable", 0
-            )
-            proxy_server = self._read_registry_value(
-                self.INTERNET_SETTINGS, "ProxyServer", ""
-            )
+            proxy_enable = self._read_registry_value("ProxyEnable", 0)
+            proxy_server = self._read_registry_value("ProxyServer", "")
             
+            auto_config_url = self._read_registry_value("AutoConfigURL")
+            if auto_config_url:
+                return f"PAC: {auto_config_url}"
             if proxy_enable and proxy_server:
                 return f"已启用: {proxy_server}"
             else:
@@ -231,10 +337,39 @@ def get_proxy_manager():
         _proxy_manager = WindowsProxyManager()
     return _proxy_manager
 
-def enable_system_proxy():
+def enable_system_proxy(proxy_server="127.0.0.1:7890"):
     """启用系统代理"""
     manager = get_proxy_manager()
-    return manager.enable_proxy()
+    return manager.enable_proxy(proxy_server)
+
+def enable_system_pac(pac_url):
+    """启用 PAC 模式"""
+    manager = get_proxy_manager()
+    return manager.enable_pac(pac_url)
+
+def get_pac_url():
+    """PAC 地址：未配置 proxy.pac_url 时指向本机的控制面板服务（监听通配地址时用 127.0.0.1 访问）"""
+    from core.settings import get_settings
+
+    pac_url = get_settings("proxy")["pac_url"]
+    if pac_url:
+        return pac_url
+    server = get_settings("server")
+    host = server["host"]
+    if host in ("", "0.0.0.0", "::"):
+        host = "127.0.0.1"
+    elif ":" in host:
+        host = f"[{host}]"
+    return f"http://{host}:{server['port']}/proxy.pac"
+
+def enable_launcher_proxy(mixed_port=7890):
+    """按配置的模式（system / pac）把系统流量指向启动器"""
+    from core.settings import get_settings
+    
+    cfg = get_settings("proxy")
+    if cfg["mode"] == "pac":
+        return enable_system_pac(f"{get_pac_url()}?port={mixed_port}")
+    return enable_system_proxy(f"127.0.0.1:{mixed_port}")
 
 def disable_system_proxy():
     """禁用系统代理"""
@@ -244,4 +379,20 @@ def disable_system_proxy():
 def get_current_proxy_status():
     """获取当前代理状态"""
     manager = get_proxy_manager()
-    return manager.get_current_proxy()
\ No newline at end of file
+    return manager.get_current_proxy()
+
+
+if __name__ == "__main__":
+    # 基准：内存后端下反复切换代理的耗时（不含注册表 I/O）
+    backend = MemoryProxyBackend()
+    manager = WindowsProxyManager(backend)
+    rounds = 1000
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        manager.enable_proxy()
+        manager.disable_proxy()
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"{rounds} 次启用/禁用: {elapsed:.1f}ms (平均 {elapsed / rounds:.3f}ms/次)")
+    print(f"写入 {backend.writes} 个值, 通知 {backend.notifications} 次")
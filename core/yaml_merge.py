@@ -1,234 +1,432 @@
 # yaml_merge.py（Gemini 优化版 - 完全修复）
 
-import yaml
-import requests
-import base64
-import re
-import json
-from urllib.parse import urlparse, parse_qs
-
-
-def preprocess_yaml(content: str) -> str:
-    """预处理 YAML 内容，移除特殊标签"""
-    content = re.sub(r'!\<[a-zA-Z]+\>\s*', '', content)
-    return content
-
-
-# =========================
-# 🔥 新增：URI 解析实现
-# =========================
-
-def _safe_b64decode(data: str):
-    try:
-        return base64.b64decode(data + "===").decode("utf-8", errors="ignore")
-    except Exception:
-        return None
-
-
-def _parse_vmess(uri: str):
-    try:
-        raw = _safe_b64decode(uri[8:])
-        data = json.loads(raw)
-        return {
-            "name": data.get("ps", "vmess"),
-            "type": "vmess",
-            "server": data["add"],
-            "port": int(data["port"]),
-            "uuid": data["id"],
-            "alterId": int(data.get("aid", 0)),
-            "cipher": "auto",
-            "network": data.get("net", "tcp"),
-            "tls": data.get("tls") == "tls",
-            "udp": True
-        }
-    except Exception:
-        return None
-
-
-def _parse_ss(uri: str):
-    try:
-        body = uri[5:]
-        name = "ss"
-        if "#" in body:
-            body, name = body.split("#", 1)
-
-        if "@" not in body:
-            body = _safe_b64decode(body)
-
-        cipher_pass, server_part = body.split("@")
-        cipher, password = cipher_pass.split(":")
-        server, port = server_part.split(":")
-
-        return {
-            "name": name,
-            "type": "ss",
-            "server": server,
-            "port": int(port),
-            "cipher": cipher,
-            "password": password,
-            "udp": True
-        }
-    except Exception:
-        return None
-
-
-def _parse_trojan(uri: str):
-    try:
-        body = uri[9:]
-        name = "trojan"
-        if "#" in body:
-            body, name = body.split("#", 1)
-
-        password, server_part = body.split("@")
-        server, port = server_part.split(":")
-
-        return {
-            "name": name,
-            "type": "trojan",
-            "server": server,
-            "port": int(port),
-            "password": password,
-            "sni": server,
-            "udp": True
-        }
-    except Exception:
-        return None
-
-
-def _parse_vless(uri: str):
-    try:
-        u = urlparse(uri)
-        qs = parse_qs(u.query)
-        return {
-            "name": u.fragment or "vless",
-            "type": "vless",
-            "server": u.hostname,
-            "port": u.port,
-            "uuid": u.username,
-            "network": qs.get("type", ["tcp"])[0],
-            "tls": qs.get("security", [""])[0] == "tls",
-            "udp": True
-        }
-    except Exception:
-        return None
+import io
+from collections import Counter
+
+# parse_proxy_uri 保留在本模块导出，兼容旧的调用方式
+from core.proxy_uri import URI_LINE_RE, parse_proxy_uri, parse_uri
+from core.node import InvalidNode, Node, NodeInterner
+from core.regions import REGIONS, REGION_NAMES, classify_region, region_filter
+from core.settings import get_settings
+from core.subscription_fetch import fetch_subscription
+
+SELECTOR_GROUP = "节点选择"
+AI_GROUP = "AI节点"
+# 由启动器分层测速后选定最优节点的 select 组（Clash 自身不对它测速）
+HOT_GROUP = "热门节点"
+# 负载均衡组：成员是固定数量的 select 槽位，由启动器按评分把最优节点放进各槽位
+LB_GROUP = "负载均衡"
+# 负载均衡策略 → 说明（面板上显示）。consistent-hashing 只按目标地址哈希，
+# 同一个 API 域名的所有连接都会落在同一槽位，起不到分摊作用
+LB_STRATEGIES = {
+    "round-robin": "逐个连接轮换到各节点",
+    "sticky-sessions": "同一来源与目标在一段时间内固定走同一节点",
+    "consistent-hashing": "按目标地址固定节点，同一域名的连接不会分摊",
+}
+# 测速专用组：每个组配一个只监听本机的 mixed 入口，测速时把待测节点钉在组上，经该入口下载
+SPEEDTEST_GROUP = "测速"
+# 预热专用组：切换节点后把新节点钉在该组上，经它独占的本机入口预热，TTFB 确实记在该节点名下
+PREWARM_GROUP = "预热"
+# provider 模式：节点单独放在 provider 文件中，刷新节点只需让 Clash 重新读取该文件
+PROVIDER_NAME = "subscription"
+PROVIDER_PATH = "./providers/subscription.yaml"
+
+# 分服务的 AI 组：(组名, 测速地址)
+# 每个服务一个 select 组 +「组名自动」url-test 组，后者直接对该服务的接口测速
+AI_SERVICES = [
+    ("OpenAI", "https://api.openai.com/v1/models"),
+    ("Gemini", "https://generativelanguage.googleapis.com/"),
+    ("Claude", "https://api.anthropic.com/"),
+    ("其他AI", "https://api.x.ai/"),
+]
+
+
+def merge_subscriptions(sub_urls, options=None):
+    """合并订阅并生成配置"""
+    return build_config(merge_nodes(sub_urls), options)
 
 
-def parse_proxy_uri(uri: str):
-    """解析代理 URI（完整版实现）"""
-    uri = uri.strip()
-    if uri.startswith("vmess://"):
-        return _parse_vmess(uri)
-    if uri.startswith("ss://"):
-        return _parse_ss(uri)
-    if uri.startswith("trojan://"):
-        return _parse_trojan(uri)
-    if uri.startswith("vless://"):
-        return _parse_vless(uri)
-    return None
+def merge_nodes(sub_urls):
+    """下载并合并订阅，返回去重后的节点（Node）列表"""
+    import yaml
 
+    nodes = []
+    seen_names, seen_nodes = set(), set()
+    invalid = Counter()
+    # 驻留表只在本次合并内有效，返回后随局部变量释放
+    interner = NodeInterner()
 
-def merge_subscriptions(sub_urls):
-    """合并订阅并生成配置"""
-    proxies = []
+    def add_nodes(entries):
+        # 每个订阅解析完立即转换为 Node，原始 dict 随之释放
+        for data in entries:
+            if isinstance(data, dict) and not data.get("name"):
+                data["name"] = f"Node-{len(nodes) + 1}"
+            try:
+                node = Node.from_clash(data, interner)
+            except InvalidNode as e:
+                invalid[str(e)] += 1
+                continue
+            # 同名节点只保留第一个；同一出口换了名字的重复节点也只保留一个
+            if node.name in seen_names or node in seen_nodes:
+                continue
+            seen_names.add(node.name)
+            seen_nodes.add(node)
+            nodes.append(node)
 
     for url in sub_urls:
         try:
-            response = requests.get(url, timeout=15)
-            response.raise_for_status()
-            yml = response.text.strip()
-            yml_clean = preprocess_yaml(yml)
+            # Base64 订阅与 YAML 标签已在下载时逐块处理
+            text, _ = fetch_subscription(url)
 
             parsed = False
 
-            # ---------- 1️⃣ 直接 YAML ----------
-            try:
-                data = yaml.safe_load(yml_clean)
-                if isinstance(data, dict):
-                    found_proxies = data.get("proxies", [])
-                    if found_proxies:
-                        proxies.extend(found_proxies)
-                        parsed = True
-                elif isinstance(data, list):
-                    proxies.extend(data)
-                    parsed = True
-            except yaml.YAMLError:
-                pass
-
-            # ---------- 2️⃣ Base64 → YAML ----------
-            if not parsed:
+            # ---------- 1️⃣ YAML ----------
+            if not URI_LINE_RE.match(text):
                 try:
-                    decoded = base64.b64decode(yml + "===").decode("utf-8").strip()
-                    decoded_clean = preprocess_yaml(decoded)
-                    data = yaml.safe_load(decoded_clean)
+                    data = yaml.safe_load(text)
                     if isinstance(data, dict):
                         found_proxies = data.get("proxies", [])
                         if found_proxies:
-                            proxies.extend(found_proxies)
+                            add_nodes(found_proxies)
                             parsed = True
                     elif isinstance(data, list):
-                        proxies.extend(data)
+                        add_nodes(data)
                         parsed = True
-
-                    # ---------- 🔥 新增：Base64 → URI 行 ----------
-                    if not parsed:
-                        for line in decoded.splitlines():
-                            if line.startswith(("vmess://", "ss://", "trojan://", "vless://")):
-                                p = parse_proxy_uri(line)
-                                if p:
-                                    proxies.append(p)
-                                    parsed = True
-                except Exception:
+                except yaml.YAMLError:
                     pass
 
-            # ---------- 🔥 新增：纯 URI 文本 ----------
+            # ---------- 2️⃣ URI 行 ----------
             if not parsed:
-                for line in yml.splitlines():
-                    if line.startswith(("vmess://", "ss://", "trojan://", "vless://")):
-                        p = parse_proxy_uri(line)
-                        if p:
-                            proxies.append(p)
-                            parsed = True
+                found_proxies = []
+                rejected = Counter()
+                for line in io.StringIO(text):
+                    if not line.strip():
+                        continue
+                    p, reason = parse_uri(line)
+                    if p:
+                        found_proxies.append(p)
+                    else:
+                        rejected[reason] += 1
+                add_nodes(found_proxies)
+                if rejected:
+                    print(f"[Merge] 跳过 {sum(rejected.values())} 行: " + ", ".join(
+                        f"{reason} ×{count}" for reason, count in rejected.most_common(5)
+                    ))
 
         except Exception:
             continue
 
-    # 去重
-    seen = set()
-    unique_proxies = []
-    for i, p in enumerate(proxies):
-        if isinstance(p, dict) and p.get("name"):
-            name = p["name"]
-            if name not in seen:
-                seen.add(name)
-                unique_proxies.append(p)
-        else:
-            p["name"] = f"Node-{i+1}"
-            unique_proxies.append(p)
+    if invalid:
+        print(f"[Merge] 丢弃 {sum(invalid.values())} 个无效节点: " + ", ".join(
+            f"{reason} ×{count}" for reason, count in invalid.most_common(5)
+        ))
 
-    if not unique_proxies:
+    if not nodes:
         raise ValueError("未能从订阅链接中解析出任何有效节点")
 
-    proxy_names = [p["name"] for p in unique_proxies]
+    return nodes
+
+
+def build_config(proxies, options=None):
+    """由节点列表（Node）生成完整的 Clash 配置"""
+    options = options or get_settings("merge")
+    proxy_groups, ai_target, service_targets = build_proxy_groups(proxies, options)
+
+    if options.get("provider_mode"):
+        # 节点放在 provider 文件中（见 generate_config），本配置只含 DNS、组与规则
+        nodes_section = {"proxy-providers": {PROVIDER_NAME: {"type": "file", "path": PROVIDER_PATH}}}
+    else:
+        nodes_section = {"proxies": proxies}
+
+    listeners = []
+    speedtest = get_settings("speedtest")
+    if speedtest["enabled"]:
+        test_groups, listeners = _speedtest_section([p.name for p in proxies], options, speedtest)
+        proxy_groups += test_groups
+    prewarm = get_settings("prewarm")
+    if prewarm["enabled"]:
+        proxy_groups.append({"name": PREWARM_GROUP, "type": "select", **_members([p.name for p in proxies], options)})
+        listeners.append({
+            "name": "prewarm",
+            "type": "mixed",
+            "listen": "127.0.0.1",
+            "port": prewarm["port"],
+            "proxy": PREWARM_GROUP,
+        })
+
+    return {
+        "mixed-port": 7890,
+        "allow-lan": True,
+        "bind-address": "*",
+        "mode": "rule",
+        "log-level": "info",
+        "external-controller": "127.0.0.1:9090",
+        "secret": "",
+        
+        # DNS 配置
+        "dns": build_dns_config(),
+        
+        **nodes_section,
+        "proxy-groups": proxy_groups,
+        "rules": build_rules(
+            ai_target,
+            service_targets,
+            options.get("lb_domains") if options.get("load_balance") else None,
+        ),
+        **({"listeners": listeners} if listeners else {}),
+    }
+
+
+def _members(names, options, region=None):
+    """
+    组成员：普通模式直接列出节点名；provider 模式引用 provider，地区组用正则筛选
+    （provider 刷新后组成员随之更新，无需改写配置）
+    """
+    if not options.get("provider_mode"):
+        return {"proxies": list(names)}
+    members = {"use": [PROVIDER_NAME]}
+    if region == "OTHER":
+        members["exclude-filter"] = region_filter("OTHER")
+    elif region:
+        members["filter"] = region_filter(region)
+    return members
+
+
+def _region_groups(proxies, options):
+    """
+    按地区生成 url-test / fallback 组。
+    auto_regions 与 ai_regions 的 url-test 组被「自动选择」、AI节点与各服务的自动组引用，外层组经它
+    当前的节点测速，因此不能 lazy（lazy 组没被直接使用时不测速，外层看到的永远是它的第一个成员）；
+    其余地区组只供手动选择，保持 lazy，只有被实际使用的地区才会测速，常驻的测速量不随订阅规模增长
+
+    Returns:
+        (dict, list): {地区代码: (url-test 组名, fallback 组名)} 与组配置列表
+    """
+    by_region = {}
+    for p in proxies:
+        by_region.setdefault(classify_region(p.name), []).append(p.name)
+
+    wanted = options.get("regions") or [code for code, _, _ in REGIONS] + ["OTHER"]
+    min_nodes = options.get("region_min_nodes", 1)
+
+    names, groups = {}, []
+    for code in wanted:
+        members = by_region.get(code, [])
+        if len(members) < min_nodes:
+            continue
+        label = REGION_NAMES.get(code, code)
+        auto_name, fallback_name = f"{label}自动", f"{label}故障转移"
+        groups.append({
+            "name": auto_name,
+            "type": "url-test",
+            "url": options["test_url"],
+            "interval": options["region_interval"],
+            "tolerance": 50,
+            "lazy": True,
+            **_members(members, options, code)
+        })
+        groups.append({
+            "name": fallback_name,
+            "type": "fallback",
+            "url": options["test_url"],
+            "interval": options["region_interval"],
+            "lazy": True,
+            **_members(members, options, code)
+        })
+        names[code] = (auto_name, fallback_name)
+
+    referenced = {names[code][0] for code in _auto_regions(names, options) + _ai_regions(names, options)}
+    for group in groups:
+        if group["name"] in referenced:
+            group["lazy"] = False
+    return names, groups
+
+
+def _auto_regions(region_names, options):
+    """参与「自动选择」比较的地区：auto_regions 中实际生成了地区组的；一个都没有时为全部地区"""
+    codes = [code for code in options.get("auto_regions") or [] if code in region_names]
+    return codes or list(region_names)
+
+
+def _ai_regions(region_names, options):
+    """AI 流量固定使用的地区"""
+    return [code for code in options.get("ai_regions") or [] if code in region_names]
+
+
+def _merge_members(groups, names, options):
+    """固定的组名在前，节点（或 provider）在后"""
+    members = _members(names, options)
+    return {"proxies": groups + members.pop("proxies", []), **members}
+
+
+def build_proxy_groups(proxies, options):
+    """
+    生成代理组
+
+    Returns:
+        (list, str, dict): 代理组列表、AI 域名规则默认指向的组名，以及 {服务: 组名}
+    """
+    proxy_names = [p.name for p in proxies]
+    region_names, region_groups = _region_groups(proxies, options)
+
+    # 自动选择只在 auto_regions 各地区的最优节点之间比较，测速量随这几个地区的节点数而非整个订阅增长
+    if region_names:
+        auto_members = {"proxies": [region_names[code][0] for code in _auto_regions(region_names, options)]}
+    else:
+        auto_members = _members(proxy_names, options)
+    region_entries = [name for pair in region_names.values() for name in pair]
 
-    # 代理组配置
     proxy_groups = [
         {
-            "name": "节点选择",
+            "name": SELECTOR_GROUP,
+            "type": "select",
+            **_merge_members(["自动选择", HOT_GROUP, "DIRECT"] + region_entries, proxy_names, options)
+        },
+        {
+            "name": HOT_GROUP,
             "type": "select",
-            "proxies": ["自动选择", "DIRECT"] + proxy_names
+            **_members(proxy_names, options)
         },
         {
             "name": "自动选择",
             "type": "url-test",
-            "url": "http://www.gstatic.com/generate_204",
+            "url": options["test_url"],
             "interval": 300,
             "tolerance": 50,
-            "proxies": proxy_names
+            **auto_members
         }
     ]
 
+    # AI 流量固定到指定地区
+    ai_target = SELECTOR_GROUP
+    ai_regions = _ai_regions(region_names, options)
+    if ai_regions:
+        ai_target = AI_GROUP
+        proxy_groups.append({
+            "name": AI_GROUP,
+            "type": "fallback",
+            "url": options["test_url"],
+            "interval": options["region_interval"],
+            "proxies": [region_names[code][0] for code in ai_regions]
+        })
+
+    service_targets = {}
+    if options.get("ai_services"):
+        service_groups, service_targets = _ai_service_groups(
+            proxy_names, region_names, ai_regions, ai_target, options
+        )
+        proxy_groups += service_groups
+
+    if options.get("load_balance"):
+        proxy_groups += _load_balance_groups(proxy_names, options)
+
+    return proxy_groups + region_groups, ai_target, service_targets
+
+
+def lb_slot_names(size):
+    """负载均衡组的槽位组名"""
+    return [f"{LB_GROUP}-{i}" for i in range(1, size + 1)]
+
+
+def lb_strategy(options):
+    """负载均衡策略，未知取值退回 round-robin"""
+    strategy = options.get("lb_strategy", "round-robin")
+    if strategy not in LB_STRATEGIES:
+        print(f"[Merge] ⚠️ 未知的负载均衡策略 {strategy}，改用 round-robin")
+        strategy = "round-robin"
+    return strategy
+
+
+def _load_balance_groups(proxy_names, options):
+    """
+    负载均衡组，策略见 LB_STRATEGIES（默认 round-robin：同一个 API 域名的连接也能分摊到各槽位）。
+    成员是 lb_size 个 select 槽位而不是具体节点，最优节点随测速结果变化时只需切换槽位，
+    配置文件保持不变，更新订阅也不会因此重启 Clash
+    """
+    slots = lb_slot_names(options.get("lb_size", 8))
+    strategy = lb_strategy(options)
+    groups = [{
+        "name": LB_GROUP,
+        "type": "load-balance",
+        "strategy": strategy,
+        "url": options["test_url"],
+        "interval": 300,
+        "lazy": True,
+        "proxies": list(slots),
+    }]
+    for slot in slots:
+        groups.append({"name": slot, "type": "select", **_members(proxy_names, options)})
+    return groups
+
+
+def _ai_service_groups(proxy_names, region_names, ai_regions, ai_target, options):
+    """
+    每个 AI 服务一个 select 组（可单独切换，默认跟随 ai_target）及其「自动」url-test 组。
+    自动组在 ai_regions（未设置时为 auto_regions）各地区组当前的最优节点之间、用该服务自己的接口测速；
+    没有地区组时直接在全部节点之间测速
+
+    Returns:
+        (list, dict): 组配置列表与 {服务: 组名}
+    """
+    codes = ai_regions or _auto_regions(region_names, options)
+    region_entries = [name for pair in region_names.values() for name in pair]
+
+    groups, targets = [], {}
+    for label, test_url in AI_SERVICES:
+        auto_name = f"{label}自动"
+        # 每个组各自一份成员列表，避免 yaml 写出锚点别名
+        if codes:
+            auto_members = {"proxies": [region_names[code][0] for code in codes]}
+        else:
+            auto_members = _members(proxy_names, options)
+        groups.append({
+            "name": label,
+            "type": "select",
+            # 默认成员是 ai_target，AI 流量仍跟随「节点选择」；选择「服务自动」组后才按该服务的接口测速
+            **_merge_members([ai_target, auto_name] + region_entries, proxy_names, options)
+        })
+        groups.append({
+            "name": auto_name,
+            "type": "url-test",
+            "url": test_url,
+            "interval": options["region_interval"],
+            "tolerance": 50,
+            "lazy": True,
+            **auto_members
+        })
+        targets[label] = label
+    return groups, targets
+
+
+def speedtest_slot_names(size):
+    """测速组名"""
+    return [f"{SPEEDTEST_GROUP}-{i}" for i in range(1, size + 1)]
+
+
+def _speedtest_section(proxy_names, options, speedtest):
+    """
+    测速组与对应的入口：测速-i 经 127.0.0.1:(base_port + i - 1) 访问，不影响正常流量的分流
+
+    Returns:
+        (list, list): 组配置与 listeners 配置
+    """
+    groups, listeners = [], []
+    for i, name in enumerate(speedtest_slot_names(speedtest["slots"])):
+        groups.append({"name": name, "type": "select", **_members(proxy_names, options)})
+        listeners.append({
+            "name": f"speedtest-{i + 1}",
+            "type": "mixed",
+            "listen": "127.0.0.1",
+            "port": speedtest["base_port"] + i,
+            "proxy": name,
+        })
+    return groups, listeners
+
+
+def build_dns_config():
+    """DNS 配置"""
     # 🔥🔥🔥 针对 Gemini 的完整 DNS 配置
-    dns_config = {
+    return {
         "enable": True,
         "ipv6": False,
         "prefer-h3": False,
@@ -336,8 +534,18 @@ def merge_subscriptions(sub_urls):
         }
     }
 
+
+def build_rules(ai_target=SELECTOR_GROUP, service_targets=None, balanced_domains=None):
+    """
+    分流规则，AI 服务域名指向各自的服务组（未分服务时指向 ai_target）；
+    balanced_domains 中的域名优先走负载均衡组
+    """
+    service_targets = service_targets or {}
+    openai, gemini, claude, other_ai = (
+        service_targets.get(label, ai_target) for label, _ in AI_SERVICES
+    )
     # 🔥🔥🔥 针对 Gemini 优化的规则（更细致的匹配）
-    rules = [
+    return [
         # 本地网络直连
         "DOMAIN-SUFFIX,local,DIRECT",
         "IP-CIDR,127.0.0.0/8,DIRECT",
@@ -345,13 +553,16 @@ def merge_subscriptions(sub_urls):
         "IP-CIDR,192.168.0.0/16,DIRECT",
         "IP-CIDR,10.0.0.0/8,DIRECT",
         
+        # 批量 API 流量走负载均衡组（需排在服务组规则之前）
+        *(f"DOMAIN-SUFFIX,{domain},{LB_GROUP}" for domain in balanced_domains or []),
+        
         # 🔥🔥🔥 Google/Gemini 相关域名（最高优先级）
         # Gemini 核心域名
-        "DOMAIN,gemini.google.com,节点选择",
-        "DOMAIN-SUFFIX,gemini.google.com,节点选择",
-        "DOMAIN,ai.google.dev,节点选择",
-        "DOMAIN,makersuite.google.com,节点选择",
-        "DOMAIN,generativelanguage.googleapis.com,节点选择",
+        f"DOMAIN,gemini.google.com,{gemini}",
+        f"DOMAIN-SUFFIX,gemini.google.com,{gemini}",
+        f"DOMAIN,ai.google.dev,{gemini}",
+        f"DOMAIN,makersuite.google.com,{gemini}",
+        f"DOMAIN,generativelanguage.googleapis.com,{gemini}",
         
         # Google 主域名和常用服务
         "DOMAIN-SUFFIX,google.com,节点选择",
@@ -376,15 +587,22 @@ def merge_subscriptions(sub_urls):
         "DOMAIN-SUFFIX,googlevideo.com,节点选择",
         
         # 🔥 OpenAI
-        "DOMAIN-SUFFIX,openai.com,节点选择",
-        "DOMAIN-SUFFIX,chatgpt.com,节点选择",
-        "DOMAIN-SUFFIX,oaiusercontent.com,节点选择",
-        "DOMAIN-SUFFIX,oaistatic.com,节点选择",
-        "DOMAIN-SUFFIX,auth0.com,节点选择",
+        f"DOMAIN-SUFFIX,openai.com,{openai}",
+        f"DOMAIN-SUFFIX,chatgpt.com,{openai}",
+        f"DOMAIN-SUFFIX,oaiusercontent.com,{openai}",
+        f"DOMAIN-SUFFIX,oaistatic.com,{openai}",
+        f"DOMAIN-SUFFIX,auth0.com,{openai}",
         
         # 🔥 Anthropic
-        "DOMAIN-SUFFIX,anthropic.com,节点选择",
-        "DOMAIN-SUFFIX,claude.ai,节点选择",
+        f"DOMAIN-SUFFIX,anthropic.com,{claude}",
+        f"DOMAIN-SUFFIX,claude.ai,{claude}",
+        
+        # 其他 AI 服务
+        f"DOMAIN-SUFFIX,grok.com,{other_ai}",
+        f"DOMAIN-SUFFIX,x.ai,{other_ai}",
+        f"DOMAIN-SUFFIX,perplexity.ai,{other_ai}",
+        f"DOMAIN-SUFFIX,poe.com,{other_ai}",
+        f"DOMAIN-SUFFIX,mistral.ai,{other_ai}",
         
         # 其他国际服务
         "DOMAIN-SUFFIX,github.com,节点选择",
@@ -422,20 +640,3 @@ def merge_subscriptions(sub_urls):
         # 最终规则
         "MATCH,节点选择"
     ]
-
-    return {
-        "mixed-port": 7890,
-        "allow-lan": True,
-        "bind-address": "*",
-        "mode": "rule",
-        "log-level": "info",
-        "external-controller": "127.0.0.1:9090",
-        "secret": "",
-        
-        # DNS 配置
-        "dns": dns_config,
-        
-        "proxies": unique_proxies,
-        "proxy-groups": proxy_groups,
-        "rules": rules
-    }
\ No newline at end of file
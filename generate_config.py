@@ -1,29 +1,71 @@
+import hashlib
 import os
-import yaml
-from core.yaml_merge import merge_subscriptions
+from core.node import Node, represent_node
+from core.node_stats import get_node_stats
+from core.settings import get_settings
+from core.yaml_merge import PROVIDER_PATH, build_config, merge_nodes
+
+def _file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
 
 def generate_config_from_url(sub_url):
     """
     下载用户输入的订阅链接并合并生成 config.yaml
     """
+    config_path, _, _ = update_config_from_url(sub_url)
+    return config_path
+
+
+def _write_if_changed(path, data):
+    """内容与现有文件相同时不改写；否则先写临时文件再替换，运行中的 Clash 不会读到半截文件"""
+    if hashlib.sha256(data).hexdigest() == _file_digest(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def update_config_from_url(sub_url):
+    """
+    生成 config.yaml（provider 模式下另有节点文件）；内容未变化的文件不改写
+
+    Returns:
+        (str, bool, bool): 配置文件路径、配置是否有变化、节点是否有变化
+        普通模式下两者相同；provider 模式下只有节点变化时无需重启，刷新 provider 即可
+    """
     if not sub_url or not sub_url.strip():
         raise ValueError("订阅链接不能为空")
     
     sub_url = sub_url.strip()
-    if not sub_url.startswith("http"):
-        raise ValueError("请输入有效的 HTTP/HTTPS 链接")
+    if not sub_url.startswith(("http", "clashn://")):
+        raise ValueError("请输入有效的 HTTP/HTTPS 链接或 clashn://daily")
 
     print(f"[Config] 正在获取订阅内容: {sub_url}")
     
+    options = get_settings("merge")
     try:
         # 传入 URL 列表给合并工具
-        config_data = merge_subscriptions([sub_url])
+        nodes = merge_nodes([sub_url])
+        config_data = build_config(nodes, options)
     except Exception as e:
         raise RuntimeError(f"解析订阅失败: {str(e)}")
 
-    if not config_data or not config_data.get("proxies"):
+    if not nodes:
         raise RuntimeError("该链接未返回任何有效的 Clash 节点")
 
+    # 已从订阅中消失的节点不再保留统计（数据库中的行在下次自动保存时删除）
+    pruned = get_node_stats().prune(node.name for node in nodes)
+    if pruned:
+        print(f"[Config] 已清理 {pruned} 个已下线节点的统计")
+
     # 修复：使用项目根目录而不是当前文件目录
     # 获取当前工作目录（项目根目录）
     project_root = os.getcwd()
@@ -31,11 +73,25 @@ def generate_config_from_url(sub_url):
     os.makedirs(config_dir, exist_ok=True)
     config_path = os.path.join(config_dir, "config.yaml")
 
-    print(f"[Config] 配置将保存到: {config_path}")
+    import yaml
 
-    with open(config_path, "w", encoding="utf-8") as f:
-        yaml.dump(config_data, f, allow_unicode=True, sort_keys=False)
-    
-    print(f"[Config] 配置已保存，共 {len(config_data.get('proxies', []))} 个节点")
+    # 节点以 Node 存放，直接按映射写出
+    yaml.add_representer(Node, represent_node)
+
+    nodes_changed = None
+    if options.get("provider_mode"):
+        provider_path = os.path.join(config_dir, os.path.normpath(PROVIDER_PATH))
+        provider_data = yaml.dump({"proxies": nodes}, allow_unicode=True, sort_keys=False).encode("utf-8")
+        nodes_changed = _write_if_changed(provider_path, provider_data)
+        print(f"[Config] 节点文件{'已更新' if nodes_changed else '未变化'}: {provider_path}")
+
+    data = yaml.dump(config_data, allow_unicode=True, sort_keys=False).encode("utf-8")
+    changed = _write_if_changed(config_path, data)
+    if changed:
+        print(f"[Config] 配置已保存到: {config_path}")
+    else:
+        print("[Config] 配置未变化，保留现有配置文件")
+
+    print(f"[Config] 共 {len(nodes)} 个节点")
     
-    return config_path
\ No newline at end of file
+    return config_path, changed, changed if nodes_changed is None else nodes_changed
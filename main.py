@@ -1,15 +1,18 @@
+import asyncio
+import functools
 import os
 import sys
 import threading
 import time
 import webbrowser
-import requests
-import uvicorn
-import pystray
-from PIL import Image, ImageDraw
-from fastapi import FastAPI, HTTPException
+
+from core.startup_timeline import mark, get_timeline
+
+# uvicorn / pystray / PIL / requests / yaml 只在用到时才导入，缩短冷启动
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from typing import List, Optional
 
 # ==================================================
 # PyInstaller 资源路径
@@ -25,97 +28,244 @@ sys.path.append(BASE_DIR)
 # ==================================================
 # 项目模块
 # ==================================================
-from generate_config import generate_config_from_url
-from core.clash_runner import start_clash, stop_clash, get_clash_status
+from generate_config import update_config_from_url
+from core.clash_runner import (
+    start_clash,
+    stop_clash,
+    get_clash_status,
+    wait_clash_ready,
+    get_mixed_port,
+    get_slot_supervisor,
+    get_core_dir,
+    get_listener_port,
+    claim_public_port,
+    SLOTS,
+)
+from core.bluegreen import blue_green_swap, reload_in_place
+from core.settings import get_settings
+from core.clash_api import SELECTOR_GROUP, get_controller
+from core.yaml_merge import AI_SERVICES, PROVIDER_NAME
+from core.clash_api import switch_node as clash_switch_node
+from core.pac import get_pac
+from core.dns_warmup import get_dns_warmer
+from core.geodata import get_geodata_manager
+from core.health_tiers import get_health_checker
+from core.load_balance import get_load_balancer
+from core.prewarm import get_prewarmer
+from core.speedtest import check_url as check_speedtest_url, get_speed_tester
+from core.node_stats import get_node_stats
+from core.state_store import file_sha256, get_state_store
+from core.update_manager import get_update_scheduler
+from core.node_index import (
+    SORT_KEYS, StaleCursor, get_snapshot, invalidate_snapshot, encode_cursor, decode_cursor, resolve_group,
+)
 from core.windows_proxy import (
-    enable_system_proxy,
+    enable_launcher_proxy,
     disable_system_proxy,
     get_current_proxy_status,
 )
-from startup_cleanup import perform_startup_cleanup
+from startup_cleanup import get_cleaner
+from core.startup_pipeline import StartupPipeline
+
+mark("imports")
 
 # ==================================================
 # 配置
 # ==================================================
 CONFIG_PATH = os.path.join(BASE_DIR, "config", "config.yaml")
-DASHBOARD_URL = "http://127.0.0.1:8080/"
-CLASH_API_PROXIES = "http://127.0.0.1:9090/proxies"
+
+
+def dashboard_url():
+    """控制面板地址（配置在首次使用时才读取，导入 main 时不加载 yaml）"""
+    return f"http://127.0.0.1:{get_settings('server')['port']}/"
+
 
 app = FastAPI()
 proxy_enabled = False
+# 手动更新与定时更新互斥
+_update_lock = threading.Lock()
+# 系统代理状态只在启动后首次就绪时恢复
+_state_restored = False
+
+def set_proxy_enabled(enabled):
+    """用户开关系统代理：更新内存状态并持久化，重启后据此恢复"""
+    global proxy_enabled
+    proxy_enabled = enabled
+    get_state_store().set("proxy_enabled", enabled)
+
+
+def restore_state(controller):
+    """
+    核心就绪后恢复上次的节点选择（含崩溃重启）；系统代理只在启动后首次就绪时恢复
+    """
+    global _state_restored
+    selected = get_state_store().get("selected", {})
+    if selected and get_state_store().get("config_hash") != file_sha256(CONFIG_PATH):
+        print("[State] ⚠️ 配置已变化，上次选择的节点可能已不存在")
+    restored = 0
+    for group, name in selected.items():
+        try:
+            if controller.select_proxy(group, name):
+                restored += 1
+        except Exception as e:
+            print(f"[State] ⚠️ 恢复 {group} 失败: {e}")
+    if restored:
+        print(f"[State] 已恢复 {restored}/{len(selected)} 个组的节点选择")
+        invalidate_snapshot()
+
+    if not _state_restored:
+        _state_restored = True
+        if get_state_store().get("proxy_enabled", False) and not proxy_enabled:
+            print("[State] 恢复上次的系统代理状态")
+            enable_launcher_proxy(get_mixed_port())
+            set_proxy_enabled(True)
+    _tray_wakeup.set()
+
+
+def restore_node_stats():
+    """载入保存的节点统计，并定期保存"""
+    stats = get_node_stats()
+    get_state_store().load_node_stats(stats)
+    get_state_store().start_autosave(stats)
+
 
 # ==================================================
 # 数据模型
 # ==================================================
 class UpdateSubRequest(BaseModel):
     url: str
+    # 蓝绿切换：新核心就绪后再切换端口，为空时使用 launcher_config.yaml 中的设置
+    blue_green: Optional[bool] = None
 
 class SwitchNodeRequest(BaseModel):
     name: str
+    # 要切换的组（如 OpenAI、Gemini 等分服务组），为空表示节点选择
+    group: Optional[str] = None
+    # 切换后断开旧节点上的存量连接（流式响应、WebSocket 等）
+    drain: bool = False
+    # 只断开目标主机匹配这些域名后缀的连接，为空表示不限
+    drain_hosts: List[str] = []
+    # 只断开命中这些规则（如 DOMAIN-SUFFIX 或 openai.com）的连接，为空表示不限
+    drain_rules: List[str] = []
+    # 切换后预热 AI 服务连接，为空时使用 launcher_config.yaml 中的设置
+    prewarm: Optional[bool] = None
+
+class SpeedTestRequest(BaseModel):
+    # 待测节点，为空时测速热门层中评分最好的 limit 个节点
+    names: List[str] = []
+    limit: int = 10
+    # 测速地址，为空时使用 launcher_config.yaml 中的设置
+    url: Optional[str] = None
 
 # ==================================================
 # API (修复版)
 # ==================================================
-@app.post("/api/update_subscription")
-async def update_subscription(req: UpdateSubRequest):
+def apply_subscription(url, blue_green=None):
     """
-    更新订阅配置并启动 Clash
+    生成新配置并让 Clash 加载；手动更新与定时更新共用，在工作线程中调用
+    配置与现有文件完全相同时不重启 Clash
     """
     global proxy_enabled
-    
+
+    if not _update_lock.acquire(blocking=False):
+        return {"status": "error", "message": "已有订阅更新正在进行，请稍后再试"}
+
     try:
-        # 1️⃣ 如果代理已启用，先禁用
+        if blue_green is None:
+            blue_green = get_settings("update")["blue_green"]
+
+        # 1️⃣ 生成新的配置文件（旧核心继续服务）
+        print(f"[API] 正在生成配置文件: {url}")
+        config_path, changed, nodes_changed = update_config_from_url(url)
+        if not os.path.exists(config_path):
+            raise RuntimeError(f"配置文件生成失败: {config_path}")
+        get_state_store().set("config_hash", file_sha256(config_path))
+
+        running = get_clash_status()["running"]
+        if not changed and nodes_changed and running:
+            # provider 模式：只让 Clash 重新读取节点文件，DNS、规则与现有连接不受影响
+            started = time.perf_counter()
+            if get_controller().update_provider(PROVIDER_NAME):
+                elapsed_ms = round((time.perf_counter() - started) * 1000)
+                print(f"[API] ✅ 节点已刷新 ({elapsed_ms}ms)，无需重启 Clash")
+                return {
+                    "status": "success",
+                    "message": "节点已刷新，无需重启",
+                    "changed": True,
+                    "clash_running": True,
+                    "provider_refresh_ms": elapsed_ms
+                }
+            print("[API] ⚠️ 刷新节点失败，改为重启 Clash")
+            changed = True
+
+        if not changed and running:
+            print("[API] 订阅内容未变化，无需重启 Clash")
+            return {
+                "status": "success",
+                "message": "订阅内容未变化，无需重启",
+                "changed": False,
+                "clash_running": True
+            }
+
+        # 蓝绿模式：旧核心继续服务，新核心就绪后再接管对外端口
+        # 网关模式下局域网客户端还依赖 DNS 监听，改为原地重新加载，所有端口保持不动
+        if blue_green and running:
+            swap = reload_in_place() if is_headless() else blue_green_swap()
+            return {
+                "status": "success",
+                "message": "订阅更新成功，已无缝切换到新配置",
+                "changed": changed,
+                "clash_running": get_clash_status()["running"],
+                "swap": swap
+            }
+
+        # 2️⃣ 如果代理已启用，先禁用
+        was_enabled = proxy_enabled
         if proxy_enabled:
             disable_system_proxy()
             proxy_enabled = False
             print("[API] 已禁用系统代理")
 
-        # 2️⃣ 停止现有的 Clash 进程
+        # 3️⃣ 停止现有的 Clash 进程
         print("[API] 正在停止现有 Clash 进程...")
         stop_clash()
         time.sleep(1.5)
 
-        # 3️⃣ 生成新的配置文件
-        print(f"[API] 正在生成配置文件: {req.url}")
-        config_path = generate_config_from_url(req.url)
-        
-        # 4️⃣ 验证配置文件是否生成成功
-        if not os.path.exists(config_path):
-            raise RuntimeError(f"配置文件生成失败: {config_path}")
-        
-        print(f"[API] ✅ 配置文件已生成: {config_path}")
-        
-        # 5️⃣ 启动 Clash
+        # 4️⃣ 启动 Clash
         print("[API] 正在启动 Clash...")
-        clash_started = start_clash()
-        
-        if not clash_started:
+        if not start_clash():
             raise RuntimeError("Clash 启动失败，请检查配置文件")
-        
-        # 6️⃣ 等待 Clash 完全启动
-        time.sleep(2)
-        
-        # 7️⃣ 验证 Clash 是否成功运行
-        max_retries = 5
-        for i in range(max_retries):
-            try:
-                response = requests.get(CLASH_API_PROXIES, timeout=2)
-                if response.status_code == 200:
-                    print(f"[API] ✅ Clash 已成功启动 (尝试 {i+1}/{max_retries})")
-                    break
-            except requests.RequestException:
-                if i < max_retries - 1:
-                    print(f"[API] ⏳ 等待 Clash 启动... ({i+1}/{max_retries})")
-                    time.sleep(1)
-                else:
-                    print("[API] ⚠️ Clash 可能未完全启动，但配置已更新")
-        
+
+        # 5️⃣ 等待 Clash 控制器就绪（由守护者探测）
+        if wait_clash_ready():
+            print("[API] ✅ Clash 已成功启动")
+            # 定时更新在后台进行，恢复更新前的代理状态
+            if was_enabled:
+                enable_launcher_proxy(get_mixed_port())
+                proxy_enabled = True
+        else:
+            print("[API] ⚠️ Clash 可能未完全启动，但配置已更新")
+
         return {
             "status": "success",
             "message": "订阅更新成功，Clash 已启动",
+            "changed": changed,
             "clash_running": get_clash_status()["running"]
         }
-        
+    finally:
+        _update_lock.release()
+        invalidate_snapshot()
+        _tray_wakeup.set()
+
+
+@app.post("/api/update_subscription")
+async def update_subscription(req: UpdateSubRequest):
+    """
+    更新订阅配置并启动 Clash
+    """
+    try:
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(None, apply_subscription, req.url, req.blue_green)
     except Exception as e:
         print(f"[API] ❌ 更新订阅失败: {str(e)}")
         return {
@@ -123,11 +273,37 @@ async def update_subscription(req: UpdateSubRequest):
             "message": f"更新失败: {str(e)}"
         }
 
+    if result["status"] == "success":
+        # 之后由定时更新器接管这个订阅
+        get_update_scheduler().remember_url(req.url.strip())
+    return result
+
+
+@app.get("/api/update_status")
+async def get_update_status():
+    """定时更新状态（上次/下次运行时间与结果）"""
+    return get_update_scheduler().status()
+
 
 @app.get("/api/nodes")
-async def get_nodes():
+async def get_nodes(
+    q: Optional[str] = None,
+    type: Optional[str] = None,
+    region: Optional[str] = None,
+    min_delay: Optional[int] = None,
+    max_delay: Optional[int] = None,
+    sort: str = "default",
+    order: str = "asc",
+    cursor: Optional[str] = None,
+    limit: int = 0,
+):
     """
-    获取节点列表 (修复版 - 处理边界情况)
+    获取节点列表（支持筛选、排序、游标分页）
+    
+    - q: 名称子串; type: 协议类型; region: 地区代码 (HK/JP/US...)
+    - min_delay / max_delay: 延迟区间 (ms)
+    - sort: default / delay / name / loss; order: asc / desc
+    - cursor + limit: 分页，limit 为 0 时返回全部
     """
     try:
         # 检查 Clash 是否运行
@@ -139,18 +315,20 @@ async def get_nodes():
                 "message": "Clash 未运行，请先更新订阅"
             }
         
-        response = requests.get(CLASH_API_PROXIES, timeout=3)
-        data = response.json()
+        if sort not in SORT_KEYS:
+            raise HTTPException(status_code=400, detail=f"不支持的排序方式: {sort}")
         
-        # 🔥 修复：安全获取代理组信息
-        proxies = data.get("proxies", {})
-        selector_group = proxies.get("节点选择", {})
+        loop = asyncio.get_event_loop()
+        snapshot = await loop.run_in_executor(None, get_snapshot)
+        try:
+            offset = decode_cursor(cursor, snapshot.version)
+        except StaleCursor as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # 🔥 修复：处理空列表情况
-        all_nodes = selector_group.get("all", [])
-        current = selector_group.get("now", "")
-        
-        if not all_nodes:
+        if not snapshot.nodes:
             print("[API] ⚠️ 未找到任何节点")
             return {
                 "nodes": [],
@@ -158,58 +336,50 @@ async def get_nodes():
                 "message": "配置文件中没有可用节点"
             }
         
-        nodes = []
-        for name in all_nodes:
-            # 跳过代理组
-            if name in ["自动选择", "DIRECT"]:
-                continue
-            
-            # 🔥 修复：安全获取节点信息
-            node_info = proxies.get(name, {})
-            
-            # 🔥 修复：安全获取延迟信息
-            history = node_info.get("history", [])
-            if history and len(history) > 0:
-                # 获取最后一次测速记录
-                last_test = history[-1]
-                delay = last_test.get("delay", 0) if isinstance(last_test, dict) else 0
-                
-                if delay > 0:
-                    delay_str = f"{delay}ms"
-                else:
-                    delay_str = "未测速"
-            else:
-                delay_str = "未测速"
-            
-            nodes.append({
-                "name": name,
-                "delay": delay_str,
-                "type": node_info.get("type", "unknown")
-            })
+        page, total = snapshot.query(
+            q=q,
+            node_type=type,
+            region=region,
+            min_delay=min_delay,
+            max_delay=max_delay,
+            sort=sort,
+            desc=order == "desc",
+            offset=offset,
+            limit=max(limit, 0),
+        )
         
-        print(f"[API] ✅ 获取到 {len(nodes)} 个节点，当前选择: {current}")
+        nodes = [
+            {
+                "name": node["name"],
+                "delay": f"{node['delay_ms']}ms" if node["delay_ms"] else "未测速",
+                "delay_ms": node["delay_ms"],
+                "loss": node["loss"],
+                "type": node["type"],
+                "region": node["region"],
+            }
+            for node in page
+        ]
         
+        next_offset = offset + len(page)
         return {
             "nodes": nodes,
-            "current": current,
-            "total": len(nodes)
+            "current": snapshot.current,
+            "total": total,
+            "next_cursor": (
+                encode_cursor(next_offset, snapshot.version) if limit > 0 and next_offset < total else None
+            )
         }
         
-    except requests.RequestException as e:
+    except HTTPException:
+        raise
+    except OSError as e:
+        # requests 的网络异常都继承自 OSError，无需为此提前导入 requests
         print(f"[API] ❌ 获取节点失败 (网络错误): {str(e)}")
         return {
             "nodes": [],
             "current": None,
             "message": f"无法连接到 Clash API: {str(e)}"
         }
-    except KeyError as e:
-        print(f"[API] ❌ 获取节点失败 (数据格式错误): {str(e)}")
-        print(f"[API] 原始数据: {data if 'data' in locals() else 'N/A'}")
-        return {
-            "nodes": [],
-            "current": None,
-            "message": f"配置文件格式错误: {str(e)}"
-        }
     except Exception as e:
         print(f"[API] ❌ 获取节点失败 (未知错误): {str(e)}")
         import traceback
@@ -226,7 +396,7 @@ async def switch_node(req: SwitchNodeRequest):
     """
     切换节点
     """
-    global proxy_enabled
+    started = time.perf_counter()
     
     try:
         # 检查 Clash 是否运行
@@ -234,30 +404,46 @@ async def switch_node(req: SwitchNodeRequest):
         if not clash_status["running"]:
             raise RuntimeError("Clash 未运行，请先更新订阅")
         
-        # 切换节点
-        response = requests.put(
-            f"{CLASH_API_PROXIES}/节点选择",
-            json={"name": req.name},
-            timeout=3
+        # 切换节点（可选断开旧节点连接）
+        group = req.group or SELECTOR_GROUP
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(
+            None,
+            functools.partial(
+                clash_switch_node,
+                req.name,
+                group=group,
+                drain=req.drain,
+                drain_hosts=req.drain_hosts,
+                drain_rules=req.drain_rules,
+            ),
         )
         
-        if response.status_code != 204:
-            raise RuntimeError(f"切换节点失败: HTTP {response.status_code}")
-        
-        print(f"[API] ✅ 已切换到节点: {req.name}")
+        print(f"[API] ✅ {group} 已切换到: {req.name} ({result['elapsed_ms']}ms)")
+        invalidate_snapshot()
+        get_state_store().update("selected", {group: req.name})
         
         # 首次切换节点时自动启用系统代理
         was_enabled = proxy_enabled
         if not proxy_enabled:
             print("[API] 首次选择节点，正在启用系统代理...")
-            enable_system_proxy()
-            proxy_enabled = True
+            enable_launcher_proxy(get_mixed_port())
+            set_proxy_enabled(True)
+        _tray_wakeup.set()
+
+        # 后台预热新节点上的 AI 服务连接
+        prewarmer = get_prewarmer()
+        if prewarmer.enabled if req.prewarm is None else req.prewarm:
+            prewarmer.run_async(req.name, get_listener_port(prewarmer.port))
         
         return {
             "status": "success",
             "message": f"已切换到 {req.name}",
+            "group": group,
             "proxy_enabled": proxy_enabled,
-            "first_time": not was_enabled
+            "first_time": not was_enabled,
+            "closed_connections": result["closed_connections"],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
         }
         
     except Exception as e:
@@ -265,6 +451,78 @@ async def switch_node(req: SwitchNodeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/ai_services")
+async def get_ai_services():
+    """各 AI 服务组当前的节点与延迟"""
+    if not get_clash_status()["running"]:
+        return {"services": [], "message": "Clash 未运行"}
+    try:
+        proxies = get_controller().get_proxies(timeout=2)
+    except Exception as e:
+        return {"services": [], "message": f"获取代理组失败: {e}"}
+
+    services = []
+    for label, test_url in AI_SERVICES:
+        status = resolve_group(proxies, label)
+        if status is not None:
+            services.append({**status, "test_url": test_url})
+    return {"services": services}
+
+
+@app.get("/api/load_balance")
+async def get_load_balance_status():
+    """负载均衡槽位及经负载均衡组的连接在各节点上的分布"""
+    balancer = get_load_balancer()
+    status = balancer.status()
+    if balancer.enabled and get_clash_status()["running"]:
+        try:
+            loop = asyncio.get_event_loop()
+            status["distribution"] = await loop.run_in_executor(None, balancer.distribution)
+        except Exception as e:
+            status["message"] = f"获取连接失败: {e}"
+    return status
+
+
+@app.post("/api/speedtest")
+async def start_speedtest(req: SpeedTestRequest):
+    """后台带宽测速，结果写入节点统计，进度与结果见 GET /api/speedtest"""
+    tester = get_speed_tester()
+    if not tester.enabled:
+        raise HTTPException(status_code=400, detail="带宽测速未启用，请在 launcher_config.yaml 中设置 speedtest.enabled: true 并重新更新订阅")
+    if req.url:
+        try:
+            check_speedtest_url(req.url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if not get_clash_status()["running"]:
+        raise HTTPException(status_code=400, detail="Clash 未运行，请先更新订阅")
+
+    names = req.names
+    if not names:
+        names = get_health_checker().hot
+        if not names:
+            loop = asyncio.get_event_loop()
+            snapshot = await loop.run_in_executor(None, get_snapshot)
+            names = [node["name"] for node in snapshot.nodes]
+        names = names[:max(req.limit, 1)]
+    base_port = get_listener_port(get_settings("speedtest")["base_port"])
+    if not tester.run_async(names, base_port, req.url):
+        raise HTTPException(status_code=409, detail="已有测速正在进行")
+    return {"status": "started", "nodes": names}
+
+
+@app.get("/api/speedtest")
+async def get_speedtest_status():
+    """测速进度与最近一次的结果"""
+    return get_speed_tester().status()
+
+
+@app.get("/api/state")
+async def get_state():
+    """持久化的状态：上次选择的节点、代理开关与配置哈希"""
+    return get_state_store().status()
+
+
 @app.get("/api/proxy_status")
 async def get_proxy_status():
     """获取代理状态"""
@@ -275,6 +533,59 @@ async def get_proxy_status():
         "clash_running": clash_status["running"]
     }
 
+@app.get("/api/health")
+async def get_health_status():
+    """分层测速状态：热门层节点、最优节点、累计测速次数"""
+    return get_health_checker().status()
+
+
+@app.get("/api/startup")
+async def get_startup_timeline():
+    """启动时间线（毫秒）"""
+    return get_timeline()
+
+
+@app.get("/api/dns_warmup")
+async def get_dns_warmup_status():
+    """最近一次 DNS 预热的耗时"""
+    return get_dns_warmer().status()
+
+
+@app.get("/api/prewarm")
+async def get_prewarm_status():
+    """最近一次连接预热的各主机耗时"""
+    return get_prewarmer().status()
+
+
+@app.get("/api/geodata")
+async def get_geodata_status():
+    """GeoIP/GeoSite 数据库缓存状态"""
+    return get_geodata_manager().status()
+
+
+@app.get("/api/clash/status")
+async def get_clash_supervisor_status():
+    """Clash 守护状态：崩溃/重启/就绪耗时事件"""
+    return get_slot_supervisor().status()
+
+
+@app.get("/api/clash/log")
+async def get_clash_log(tail_kb: int = 64):
+    """最近的 Clash 核心输出"""
+    return {"log": get_slot_supervisor().log.tail(tail_kb * 1024)}
+
+@app.get("/proxy.pac")
+async def get_proxy_pac(request: Request, port: Optional[int] = None):
+    """由当前配置规则生成的 PAC 文件（按配置版本缓存，支持 ETag）"""
+    if not os.path.exists(CONFIG_PATH):
+        raise HTTPException(status_code=404, detail="配置文件不存在，请先更新订阅")
+
+    body, etag = get_pac(CONFIG_PATH, port or get_mixed_port())
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/x-ns-proxy-autoconfig", headers=headers)
+
 # ==================================================
 # 静态文件
 # ==================================================
@@ -288,44 +599,85 @@ current_node = "未选择"
 current_delay = "N/A"
 proxy_status = "未启用"
 
+# 托盘轮询节奏：状态不变时逐步拉长间隔，Clash 不可达时指数退避
+TRAY_POLL_INTERVAL = 5
+TRAY_POLL_IDLE_MAX = 30
+TRAY_POLL_BACKOFF_MAX = 60
+
+# 用户操作（切换节点/开关代理）后立即唤醒轮询线程
+_tray_wakeup = threading.Event()
+
+
+def _read_tray_state():
+    """读取托盘需要显示的状态：(节点, 延迟, 代理状态)"""
+    controller = get_controller()
+    selector = controller.get_proxy(SELECTOR_GROUP, timeout=2)
+    node = selector.get("now") or "未选择"
+
+    delay = "N/A"
+    history = controller.get_proxy(node, timeout=2).get("history") or []
+    if history and isinstance(history[-1], dict) and history[-1].get("delay", 0) > 0:
+        delay = f"{history[-1]['delay']}ms"
+
+    return node, delay, "已启用" if proxy_enabled else "未启用"
+
+
 def poll_clash_status(icon):
-    """轮询 Clash 状态（用于托盘显示）"""
+    """轮询 Clash 状态（用于托盘显示），只在状态变化时重绘菜单"""
     global current_node, current_delay, proxy_status
+    last_state = None
+    interval = TRAY_POLL_INTERVAL
+    failures = 0
+
     while True:
         try:
-            resp = requests.get(CLASH_API_PROXIES, timeout=2).json()
-            selector = resp["proxies"].get("节点选择", {})
-            current_node = selector.get("now", "未选择")
-            proxy_status = "已启用" if proxy_enabled else "未启用"
+            state = _read_tray_state()
+            failures = 0
+        except Exception:
+            state = ("Clash 未运行", "N/A", "未启用")
+            failures += 1
+
+        if state != last_state:
+            current_node, current_delay, proxy_status = state
+            last_state = state
             icon.update_menu()
-        except:
-            current_node = "Clash 未运行"
-            current_delay = "N/A"
-            proxy_status = "未启用"
-        time.sleep(5)
+            interval = TRAY_POLL_INTERVAL
+        elif not failures:
+            interval = min(interval * 2, TRAY_POLL_IDLE_MAX)
+
+        if failures:
+            interval = min(TRAY_POLL_INTERVAL * 2 ** failures, TRAY_POLL_BACKOFF_MAX)
+
+        _tray_wakeup.wait(interval)
+        _tray_wakeup.clear()
 
 # ==================================================
 # 托盘
 # ==================================================
 def create_tray_icon():
+    import pystray
+    from PIL import Image, ImageDraw
+
     img = Image.new("RGB", (64, 64), (15, 23, 42))
     d = ImageDraw.Draw(img)
     d.ellipse((16, 16, 48, 48), fill=(56, 189, 248))
 
     def on_open(icon, item):
-        webbrowser.open(DASHBOARD_URL)
+        webbrowser.open(dashboard_url())
 
     def on_toggle_proxy(icon, item):
-        global proxy_enabled
         if proxy_enabled:
             disable_system_proxy()
-            proxy_enabled = False
+            set_proxy_enabled(False)
         else:
-            enable_system_proxy()
-            proxy_enabled = True
+            enable_launcher_proxy(get_mixed_port())
+            set_proxy_enabled(True)
         icon.update_menu()
+        _tray_wakeup.set()
 
     def on_exit(icon, item):
+        # 先保存状态：恢复系统设置不改变下次启动要恢复的代理状态
+        get_state_store().close(get_node_stats())
         if proxy_enabled:
             disable_system_proxy()
         stop_clash()
@@ -334,7 +686,7 @@ def create_tray_icon():
 
     menu = pystray.Menu(
         pystray.MenuItem("打开控制面板", on_open),
-        pystray.MenuItem(lambda _: f"当前节点: {current_node}", None, enabled=False),
+        pystray.MenuItem(lambda _: f"当前节点: {current_node} ({current_delay})", None, enabled=False),
         pystray.MenuItem(lambda _: f"系统代理: {proxy_status}", None, enabled=False),
         pystray.Menu.SEPARATOR,
         pystray.MenuItem(
@@ -348,40 +700,131 @@ def create_tray_icon():
     return pystray.Icon("AI_Proxy_Launcher", img, "AI Proxy Launcher", menu)
 
 # ==================================================
-# 主入口
+# 启动节点
 # ==================================================
-def main():
-    global proxy_enabled
+@app.on_event("startup")
+async def configure_executor():
+    """阻塞调用（更新订阅、切换节点等）使用的线程池大小由 server.workers 决定"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=get_settings("server")["workers"], thread_name_prefix="api")
+    )
+
+
+def start_api_server(timeout=10):
+    """在后台线程运行 uvicorn，开始监听后返回"""
+    import uvicorn
+
+    server_cfg = get_settings("server")
+    server = uvicorn.Server(uvicorn.Config(
+        app, host=server_cfg["host"], port=server_cfg["port"], log_config=None
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    deadline = time.monotonic() + timeout
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.started
+
+
+def on_tray_ready(icon):
+    icon.visible = True
+    mark("tray_icon")
+
+
+def build_startup_pipeline(headless=False):
+    """
+    启动依赖图：
+        kill_clash → start_clash → clash_ready
+        flush_dns / reset_proxy / api_server → open_dashboard 互相独立，并发执行
+    无界面模式下不打开浏览器
+    """
+    cleaner = get_cleaner()
+    pipeline = StartupPipeline()
 
-    # 启动清理
-    perform_startup_cleanup()
+    if cleaner.enabled:
+        pipeline.add("kill_clash", cleaner.kill_clash_process)
+        pipeline.add("flush_dns", cleaner.flush_dns_cache)
+        pipeline.add("reset_proxy", cleaner.reset_system_proxy)
+    else:
+        print("[Cleanup] ⚠️ 启动清理已禁用")
+
+    pipeline.add("api_server", start_api_server)
+    # 载入上次的节点统计，分层测速直接从已有评分开始
+    pipeline.add("restore_stats", restore_node_stats)
+    # 每次核心就绪后（含崩溃重启与蓝绿切换）预热 AI 域名的 DNS，并重新选定热门节点、分配负载均衡槽位
+    for slot in SLOTS:
+        # 先接管对外端口，后续回调恢复系统代理时端口已可用
+        get_slot_supervisor(slot).on_ready.append(claim_public_port)
+        get_slot_supervisor(slot).on_ready.append(get_dns_warmer().warm_up)
+        get_slot_supervisor(slot).on_ready.append(get_health_checker().reset)
+        get_slot_supervisor(slot).on_ready.append(get_load_balancer().reset)
+        get_slot_supervisor(slot).on_ready.append(restore_state)
+    if get_settings("health")["enabled"]:
+        # Clash 未运行时测速器会自行等待
+        pipeline.add("health_checker", get_health_checker().start, deps=["restore_stats"])
+    if not headless:
+        pipeline.add("open_dashboard", lambda: webbrowser.open(dashboard_url()), deps=["api_server"])
+    pipeline.add("update_scheduler", get_update_scheduler(apply_subscription).start)
+    # GeoIP/GeoSite 数据库在后台下载与更新，不阻塞 Clash 启动
+    pipeline.add("geodata", lambda: get_geodata_manager().start(get_core_dir()))
 
     # 只有在配置文件存在时才尝试启动 Clash
     if os.path.exists(CONFIG_PATH):
-        print("[Main] 检测到配置文件，正在启动 Clash...")
-        start_clash()
-        time.sleep(1)
+        print("[Main] 检测到配置文件，Clash 将在清理残留进程后启动")
+        pipeline.add("start_clash", start_clash, deps=["kill_clash"] if cleaner.enabled else ())
+        pipeline.add("clash_ready", wait_clash_ready, deps=["start_clash"])
     else:
         print("[Main] 未检测到配置文件，等待用户输入订阅链接...")
 
-    # 后台启动 FastAPI
-    threading.Thread(
-        target=lambda: uvicorn.run(
-            app,
-            host="127.0.0.1",
-            port=8080,
-            log_config=None
-        ),
-        daemon=True
-    ).start()
+    return pipeline
+
+# ==================================================
+# 主入口
+# ==================================================
+def run_headless():
+    """无界面网关模式：没有托盘，收到 SIGINT/SIGTERM 后恢复代理设置并停止 Clash"""
+    import signal
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    server_cfg = get_settings("server")
+    print(f"[Main] 无界面模式，控制面板: http://{server_cfg['host']}:{server_cfg['port']}/")
+    # 主线程定期醒来，以便及时处理信号
+    while not stop.wait(1):
+        pass
+
+    print("[Main] 正在退出...")
+    get_state_store().close(get_node_stats())
+    if proxy_enabled:
+        disable_system_proxy()
+    stop_clash()
+
+
+def is_headless():
+    """无界面网关模式：配置开启或命令行带 --headless"""
+    return get_settings("server")["headless"] or "--headless" in sys.argv[1:]
+
+
+def main():
+    headless = is_headless()
+
+    # 启动步骤按依赖关系并发执行
+    build_startup_pipeline(headless).start()
+
+    if headless:
+        run_headless()
+        return
 
     # 创建托盘（主线程）
     icon = create_tray_icon()
     threading.Thread(target=poll_clash_status, args=(icon,), daemon=True).start()
-    threading.Timer(1.2, lambda: webbrowser.open(DASHBOARD_URL)).start()
 
     # 必须在主线程
-    icon.run()
+    icon.run(setup=on_tray_ready)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,9 +5,15 @@
 """
 
 import os
+import socket
 import subprocess
 import time
-import yaml
+
+# 残留核心的结束方式：Windows 用 taskkill，其他平台按进程名精确匹配
+if os.name == "nt":
+    KILL_CLASH_CMD = ["taskkill", "/F", "/IM", "clash-core.exe"]
+else:
+    KILL_CLASH_CMD = ["pkill", "-x", "clash-core"]
 
 
 class StartupCleaner:
@@ -34,6 +40,8 @@ class StartupCleaner:
         
         if os.path.exists(config_path):
             try:
+                import yaml
+
                 with open(config_path, 'r', encoding='utf-8') as f:
                     user_config = yaml.safe_load(f)
                     if user_config:
@@ -63,24 +71,53 @@ class StartupCleaner:
         
         try:
             result = subprocess.run(
-                ["taskkill", "/F", "/IM", "clash-core.exe"],
+                KILL_CLASH_CMD,
                 capture_output=True,
                 text=True
             )
             
             if result.returncode == 0:
                 self._log("[Cleanup] ✓ 已停止残留的 Clash 进程")
-                time.sleep(1)
+                self._wait_ports_released()
             return True
                 
         except Exception as e:
+            # 找不到 taskkill/pkill 等情况不应阻止 Clash 启动（start_clash 依赖本步骤）
             self._log(f"[Cleanup] ❌ 停止 Clash 进程时出错: {e}", is_error=True)
-            return False
+            return True
+    
+    def _wait_ports_released(self, ports=None, timeout=1.0):
+        """等待残留进程释放端口（代替固定的 sleep），默认检查所有槽位的代理与控制器端口"""
+        if ports is None:
+            from core.clash_runner import PUBLIC_MIXED_PORT, SLOTS
+
+            ports = [PUBLIC_MIXED_PORT]
+            ports += [port for slot in SLOTS.values() for port in (slot["mixed_port"], slot["controller_port"])]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            busy = False
+            for port in ports:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.settimeout(0.05)
+                    if sock.connect_ex(("127.0.0.1", port)) == 0:
+                        busy = True
+                        break
+            if not busy:
+                return True
+            time.sleep(0.05)
+        return False
+    
+    @property
+    def enabled(self):
+        return self.config["startup_cleanup"]["enabled"]
     
     def flush_dns_cache(self):
         """清除系统 DNS 缓存（最关键的操作）"""
         if not self.config["startup_cleanup"]["flush_dns"]:
             return True
+        if os.name != "nt":
+            # Linux 网关通常没有本机 DNS 缓存（或由 systemd-resolved 自行管理），跳过
+            return True
         
         try:
             result = subprocess.run(
@@ -106,12 +143,12 @@ class StartupCleaner:
             return True
         
         try:
-            import winreg
-            
-            key_path = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+            from core.windows_proxy import get_proxy_manager
             
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, key_path, 0, winreg.KEY_WRITE) as key:
-                winreg.SetValueEx(key, "ProxyEnable", 0, winreg.REG_DWORD, 0)
+            backend = get_proxy_manager().backend
+            if backend.read("ProxyEnable", 0) != 0:
+                backend.write_many({"ProxyEnable": 0})
+                backend.notify()
             
             self._log("[Cleanup] ✓ 系统代理已重置")
             return True